@@ -1,145 +1,320 @@
 import os
-import cv2
+import json
+import hashlib
 import numpy as np
 
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from rennips import rennips
+from image_size import ImageSizeCache
+from atomic_io import atomic_write_bytes, atomic_write_json
+from catalog import IMAGE_EXTENSIONS, index_images
+from yolo_labels import format_yolo_obb_lines
+from label_shard import pack_label_dir
+from label_formats import DOTA_CLASSES
 
 
-def convert_dota_to_yolo_obb(label_path, img_path):
+MANIFEST_VERSION = 1
+
+
+def parse_dota_labels(label_path):
+    """
+    Parse a whole DOTA label file in one pass
+    Returns an (N, 8) float array of pixel coordinates and an (N,) class index array
+    """
+    with open(label_path, 'r') as f:
+        # Skip the header lines (imagesource and gsd)
+        rows = [line.split() for line in f.readlines()[2:]]
+
+    if not rows:
+        return np.empty((0, 8), dtype=np.float64), np.empty(0, dtype=np.int64)
+
+    coords = np.array([row[:8] for row in rows], dtype=np.float64)
+    # difficult flag is not exported, but a malformed one still rejects the file
+    for number, row in enumerate(rows, 3):
+        try:
+            int(row[-1])
+        except ValueError:
+            raise ValueError(f"line {number}: difficult flag must be an integer, got {row[-1]!r}") from None
+
+    # Look up each distinct class name once instead of once per line
+    names, inverse = np.unique([row[8] for row in rows], return_inverse=True)
+    lookup = np.array([DOTA_CLASSES[name.replace("-", " ")] for name in names], dtype=np.int64)
+    return coords, lookup[inverse.reshape(-1)]
+
+
+def normalize_dota_coordinates(coords, img_width, img_height):
+    """Normalize (N, 8) pixel coordinates to 0-1 range with a single broadcast divide"""
+    norm = coords / np.array([img_width, img_height] * 4, dtype=np.float64)
+    # The second vertex has always been exported with y1 instead of y2,
+    # keep that so converted datasets stay byte-identical
+    norm[:, 3] = norm[:, 1]
+    return norm
+
+
+def convert_dota_to_yolo_obb(label_path, img_path, size_cache=None, image_stat=None):
     """
     Convert DOTA dataset format to YOLO OBB format
     DOTA format: x1 y1 x2 y2 x3 y3 x4 y4 class difficult
     YOLO OBB format: class_index x1 y1 x2 y2 x3 y3 x4 y4 (normalized 0-1)
+    image_stat, if known, saves the size cache another stat of img_path
     """
-    # Read image to get dimensions
-    img = cv2.imread(img_path)
-    if img is None:
+    # Read image dimensions from the file header (no pixel decode)
+    if size_cache is None:
+        size_cache = ImageSizeCache()
+    img_size = size_cache.get(img_path, image_stat)
+    if img_size is None:
         print(f"Warning: Could not read image {img_path}")
         return None
 
-    img_height, img_width = img.shape[:2]
+    img_width, img_height = img_size
 
-    def normalize_coordinates(x, y):
-        """Normalize coordinates to 0-1 range"""
-        return x / img_width, y / img_height
+    coords, class_ids = parse_dota_labels(label_path)
+    norm = normalize_dota_coordinates(coords, img_width, img_height)
+    return format_yolo_obb_lines(class_ids, norm)
 
-    converted_lines = []
 
-    # try:
-    with open(label_path, 'r') as f:
-        # Skip the header lines
-        lines = f.readlines()[2:]  # Skip imagesource and gsd lines
-
-        for line in lines:
-            parts = line.strip().split()
-
-            # Extract coordinates and class info
-            x1, y1, x2, y2, x3, y3, x4, y4 = map(float, parts[:8])
-            class_name = parts[8].replace("-", " ")
-            difficult = int(parts[-1])
-
-            # Convert class name to index
-            classes = {
-                "plane": 0,
-                "ship": 1,
-                "storage tank": 2,
-                "baseball diamond": 3,
-                "tennis court": 4,
-                "basketball court": 5,
-                "ground track field": 6,
-                "harbor": 7,
-                "bridge": 8,
-                "large vehicle": 9,
-                "small vehicle": 10,
-                "helicopter": 11,
-                "roundabout": 12,
-                "soccer ball field": 13,
-                "swimming pool": 14,
-                "container crane": 15
-            }
-            class_index = classes[class_name]
-
-            # Calculate remaining coordinates for rectangle
-            # x3, y3 = x2, y2  # bottom-right
-            # x4, y4 = x1, y2  # bottom-left
-
-            # Normalize all coordinates
-            x1_norm, y1_norm = normalize_coordinates(x1, y1)
-            x2_norm, y2_norm = normalize_coordinates(x2, y1)
-            x3_norm, y3_norm = normalize_coordinates(x3, y3)
-            x4_norm, y4_norm = normalize_coordinates(x4, y4)
-
-            # Format in YOLO OBB style
-            yolo_line = f"{class_index} {x1_norm:.6f} {y1_norm:.6f} {x2_norm:.6f} {y2_norm:.6f} "
-            yolo_line += f"{x3_norm:.6f} {y3_norm:.6f} {x4_norm:.6f} {y4_norm:.6f}"
-
-            converted_lines.append(yolo_line)
-
-    return converted_lines
-    # except Exception as e:
-    #     print(f"Error processing {label_path}: {str(e)}")
-    #     return None
-
-
-def process_dataset(image_dir, label_dir, output_dir):
+def convert_label_file(label_path, image_path, output_path, size_cache=None, image_stat=None):
+    """
+    Convert a single label file and write the result atomically to output_path
+    Returns the SHA-1 of the written output, or None if the image or label could not be read
+    """
+    try:
+        converted_lines = convert_dota_to_yolo_obb(label_path, image_path, size_cache, image_stat)
+    except Exception as e:
+        print(f"Error processing {label_path}: {str(e)}")
+        return None
+
+    if converted_lines is None:
+        return None
+
+    # Save converted format
+    data = "".join(line + "\n" for line in converted_lines).encode()
+    atomic_write_bytes(output_path, data)
+    return hashlib.sha1(data).hexdigest()
+
+
+def file_sha1(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def load_manifest(manifest_path):
+    """
+    Load the conversion manifest of an output directory
+    Maps label file name -> source/image stats and the hash of the converted output
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        print(f"Warning: Ignoring unreadable manifest {manifest_path}, converting everything")
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+
+def save_manifest(manifest_path, files):
+    atomic_write_json(manifest_path, {"version": MANIFEST_VERSION, "files": files})
+
+
+def _is_up_to_date(entry, job_entry, output_path, verify_outputs):
+    if entry is None:
+        return False
+    for key in ("source", "size", "mtime_ns", "image", "image_size", "image_mtime_ns"):
+        if entry.get(key) != job_entry[key]:
+            return False
+    if not os.path.exists(output_path):
+        return False
+    return not verify_outputs or file_sha1(output_path) == entry.get("output_sha1")
+
+
+def _report_unpaired(title, names, limit):
+    if not names:
+        return
+    print(f"\n{title}: {len(names)}")
+    for name in names[:limit]:
+        print(f"  {name}")
+    if len(names) > limit:
+        print(f"  ... and {len(names) - limit} more")
+
+
+# Size cache of the current pool worker, loaded once by _init_worker
+_worker_size_cache = None
+
+
+def _init_worker(size_cache_path):
+    global _worker_size_cache
+    _worker_size_cache = ImageSizeCache(size_cache_path)
+
+
+def _convert_chunk(jobs):
+    """
+    Convert a chunk of (label_path, image_path, output_path, image_stat) jobs in a pool worker
+    Returns the output hash (or None) of each job and the size cache entries it added
+    """
+    _worker_size_cache.new_entries = {}
+    digests = [convert_label_file(label_path, image_path, output_path, _worker_size_cache, image_stat)
+               for label_path, image_path, output_path, image_stat in jobs]
+    return digests, _worker_size_cache.new_entries
+
+
+def process_dataset(image_dir, label_dir, output_dir, size_cache_path=None, workers=1, chunk_size=None,
+                    incremental=True, verify_outputs=False, checkpoint_every=500,
+                    image_extensions=IMAGE_EXTENSIONS, report_limit=20, shard_path=None):
     """
     Process entire dataset converting DOTA format to YOLO OBB format
+    Image sizes are cached in output_dir/.image_sizes.json unless size_cache_path is given
+    With workers > 1 the label files are converted in chunks on a process pool
+    Images are paired with labels by stem; image_extensions sets the extension priority
+
+    With incremental=True a manifest (output_dir/.manifest.json) records the source and
+    image stats and the output hash of every converted file. Re-runs only convert new or
+    changed labels, remove outputs whose label is gone, and an interrupted run resumes from
+    the last checkpoint. verify_outputs=True also re-hashes existing outputs and reconverts
+    the ones that no longer match the manifest.
+
+    With shard_path set, all converted labels are also packed into one memory-mappable
+    label shard (see label_shard.py) for training loaders.
     """
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
 
+    if size_cache_path is None:
+        size_cache_path = os.path.join(output_dir, ".image_sizes.json")
+    size_cache = ImageSizeCache(size_cache_path)
+
+    manifest_path = os.path.join(output_dir, ".manifest.json")
+    manifest = load_manifest(manifest_path) if incremental else {}
+
     # Get all label files
-    label_files = [f for f in os.listdir(label_dir) if f.endswith('.txt')]
+    label_entries = {entry.name: entry.stat() for entry in os.scandir(label_dir)
+                     if entry.name.endswith('.txt') and entry.is_file()}
+    label_files = list(label_entries)
 
     total_files = len(label_files)
     processed_files = 0
     failed_files = 0
+    skipped_files = 0
+    removed_files = 0
 
     print(f"Found {total_files} label files to process...")
 
-    for label_file in rennips(label_files, mode='simple'):
+    def remove_output(label_file):
+        """Drop the output and manifest entry of a label that no longer converts, so no stale file is packed"""
+        nonlocal removed_files
+        output_path = os.path.join(output_dir, label_file)
+        existed = os.path.exists(output_path)
+        if existed:
+            os.remove(output_path)
+        if manifest.pop(label_file, None) is not None or existed:
+            removed_files += 1
+
+    # Drop outputs whose source label no longer exists
+    if incremental:
+        for label_file in [f for f in manifest if f not in label_entries]:
+            remove_output(label_file)
+
+    # One directory scan instead of probing every extension for every label; its stats
+    # feed the manifest entries and the size cache without another stat per image
+    image_stats = {}
+    image_index = index_images(image_dir, image_extensions, stats=image_stats)
+    unmatched_labels = []
+
+    jobs = []
+    job_entries = []
+    for label_file in label_files:
         # Construct paths
         label_path = os.path.join(label_dir, label_file)
-        image_file = label_file.replace('.txt', '.png')  # Adjust extension if needed
-        image_path = os.path.join(image_dir, image_file)
+        image_path = image_index.get(label_file[:-len('.txt')])
 
         # Skip if image doesn't exist
-        if not os.path.exists(image_path):
-            print(f"Warning: Image not found for {label_file}, trying other extensions...")
-            # Try other common extensions
-            for ext in ['.jpg', '.jpeg', '.tiff']:
-                image_path = os.path.join(image_dir, label_file.replace('.txt', ext))
-                if os.path.exists(image_path):
-                    break
-            else:
-                print(f"Error: No matching image found for {label_file}")
-                failed_files += 1
-                continue
-
-        # Convert the label file
-        converted_lines = convert_dota_to_yolo_obb(label_path, image_path)
-
-        if converted_lines is not None:
-            # Save converted format
-            output_path = os.path.join(output_dir, label_file)
-            with open(output_path, "w") as f:
-                for line in converted_lines:
-                    f.write(line + "\n")
-            processed_files += 1
-        else:
+        if image_path is None:
+            unmatched_labels.append(label_file)
             failed_files += 1
+            remove_output(label_file)
+            continue
 
-        # # Print progress
-        # if processed_files % 100 == 0:
-        #     print(f"Processed {processed_files}/{total_files} files...")
+        output_path = os.path.join(output_dir, label_file)
+        label_stat = label_entries[label_file]
+        image_stat = image_stats[label_file[:-len('.txt')]]
+        job_entry = {
+            "source": os.path.abspath(label_path),
+            "size": label_stat.st_size,
+            "mtime_ns": label_stat.st_mtime_ns,
+            "image": os.path.abspath(image_path),
+            "image_size": image_stat.st_size,
+            "image_mtime_ns": image_stat.st_mtime_ns,
+        }
+        if incremental and _is_up_to_date(manifest.get(label_file), job_entry, output_path, verify_outputs):
+            skipped_files += 1
+            continue
+
+        jobs.append((label_path, image_path, output_path, image_stat))
+        job_entries.append((label_file, job_entry))
+
+    def record(index, digest):
+        """Update counters and manifest for a finished job, checkpointing periodically"""
+        nonlocal processed_files, failed_files
+        label_file, job_entry = job_entries[index]
+        if digest is None:
+            failed_files += 1
+            remove_output(label_file)
+        else:
+            processed_files += 1
+            manifest[label_file] = dict(job_entry, output_sha1=digest)
+        if incremental and (processed_files + failed_files) % checkpoint_every == 0:
+            save_manifest(manifest_path, manifest)
+            size_cache.save()
+
+    if workers > 1 and len(jobs) > 1:
+        if chunk_size is None:
+            # A few chunks per worker keeps the pool balanced without much IPC
+            chunk_size = max(1, min(256, len(jobs) // (workers * 4)))
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(size_cache_path,)) as executor:
+            futures = {executor.submit(_convert_chunk, jobs[i:i + chunk_size]): i
+                       for i in range(0, len(jobs), chunk_size)}
+            for future in rennips(as_completed(futures), mode='simple'):
+                digests, new_entries = future.result()
+                size_cache.update(new_entries)
+                for offset, digest in enumerate(digests):
+                    record(futures[future] + offset, digest)
+    else:
+        for index, (label_path, image_path, output_path, image_stat) in enumerate(rennips(jobs, mode='simple')):
+            # Convert the label file
+            record(index, convert_label_file(label_path, image_path, output_path, size_cache, image_stat))
+
+            # # Print progress
+            # if processed_files % 100 == 0:
+            #     print(f"Processed {processed_files}/{total_files} files...")
+
+    size_cache.save()
+    if incremental:
+        save_manifest(manifest_path, manifest)
+
+    label_stems = {label_file[:-len('.txt')] for label_file in label_files}
+    orphan_images = sorted(os.path.basename(path) for stem, path in image_index.items() if stem not in label_stems)
+    _report_unpaired("Labels without a matching image", sorted(unmatched_labels), report_limit)
+    _report_unpaired("Images without a label file", orphan_images, report_limit)
 
     print(f"\nConversion completed!")
     print(f"Successfully processed: {processed_files} files")
+    if incremental:
+        print(f"Up to date (skipped): {skipped_files} files")
+        print(f"Removed stale outputs: {removed_files} files")
     print(f"Failed: {failed_files} files")
     print(f"Total: {total_files} files")
     print(f"Converted labels saved to: {output_dir}")
 
+    if shard_path is not None:
+        packed = pack_label_dir(output_dir, shard_path)
+        print(f"Packed {packed} label files into shard: {shard_path}")
+
 
 if __name__ == "__main__":
     # Directory paths
@@ -147,5 +322,5 @@ if __name__ == "__main__":
     label_dir = "labels/DOTA-v1.5_val"  # Directory containing DOTA format labels
     output_dir = f"{label_dir}_RESULT"  # Directory for output YOLO OBB format labels
 
-    # Process the entire dataset
-    process_dataset(image_dir, label_dir, output_dir)
+    # Process the entire dataset on all cores (workers=1 runs the serial path)
+    process_dataset(image_dir, label_dir, output_dir, workers=os.cpu_count() or 1)
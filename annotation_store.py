@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+
+
+ANNOTATION_STORE_VERSION = 1
+
+
+class AnnotationStore:
+    """
+    Point annotations of many images in one SQLite database (WAL mode), keyed by image path
+    Paths are stored relative to root with '/' separators, so the database moves with the
+    dataset. Every save is its own transaction and only touches the row of that image.
+    """
+    def __init__(self, db_path, root="."):
+        self.db_path = db_path
+        self.root = os.path.abspath(root)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS annotations ("
+                              "image TEXT PRIMARY KEY, points TEXT NOT NULL, updated_at REAL NOT NULL)")
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', ?)",
+                              (str(ANNOTATION_STORE_VERSION),))
+        version = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        if int(version) != ANNOTATION_STORE_VERSION:
+            raise ValueError(f"Unsupported annotation store version {version}: {db_path}")
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def key(self, image_path):
+        return os.path.relpath(os.path.abspath(image_path), self.root).replace(os.sep, "/")
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM annotations").fetchone()[0]
+
+    def get(self, image_path):
+        """Saved point list of an image, or None if it was never annotated"""
+        row = self.conn.execute("SELECT points FROM annotations WHERE image = ?",
+                                (self.key(image_path),)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def save(self, image_path, points):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO annotations (image, points, updated_at) VALUES (?, ?, ?)",
+                              (self.key(image_path), json.dumps(points), time.time()))
+
+    def delete(self, image_path):
+        with self.conn:
+            self.conn.execute("DELETE FROM annotations WHERE image = ?", (self.key(image_path),))
+
+    def annotated(self):
+        """Keys of all annotated images"""
+        return {row[0] for row in self.conn.execute("SELECT image FROM annotations")}
+
+    def coverage(self, image_paths):
+        """(annotated, total) over image_paths"""
+        annotated = self.annotated()
+        return sum(self.key(path) in annotated for path in image_paths), len(image_paths)
+
+    def import_json_files(self, entries, overwrite=False):
+        """
+        Bulk import {"points": [...]} json files in one transaction
+        entries are (image path, json path); missing or unreadable files are skipped.
+        Returns the number of imported images
+        """
+        existing = set() if overwrite else self.annotated()
+        rows = []
+        for image_path, json_path in entries:
+            key = self.key(image_path)
+            if key in existing or not os.path.isfile(json_path):
+                continue
+            try:
+                with open(json_path, 'r') as f:
+                    points = json.load(f)["points"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: Skipping unreadable annotation {json_path}: {str(e)}")
+                continue
+            rows.append((key, json.dumps(points), os.path.getmtime(json_path)))
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO annotations (image, points, updated_at) VALUES (?, ?, ?)", rows)
+        return len(rows)
+
+    def export_json(self, image_path, json_path):
+        """Write one image's points in the {"points": [...]} json layout; False if not annotated"""
+        points = self.get(image_path)
+        if points is None:
+            return False
+        with open(json_path, 'w') as f:
+            json.dump({"points": points}, f)
+        return True
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect a point annotation store")
+    parser.add_argument("db", help="annotation store database")
+    parser.add_argument("--root", default=".", help="directory image paths are relative to")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="print every annotated image")
+    export_parser = subparsers.add_parser("export", help="write one image's points as json")
+    export_parser.add_argument("image")
+    export_parser.add_argument("json")
+    args = parser.parse_args()
+
+    store = AnnotationStore(args.db, args.root)
+    if args.command == "list":
+        for image in sorted(store.annotated()):
+            print(image)
+        print(f"{len(store)} annotated images")
+    elif not store.export_json(args.image, args.json):
+        print(f"No annotation for {args.image}")
+        sys.exit(1)
+    store.close()
@@ -0,0 +1,49 @@
+import os
+import json
+import tempfile
+
+
+# mkstemp creates files as 0600; new files get the usual 0666 & ~umask instead.
+# The umask can only be read by setting it, so do that once at import, before any threads
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def _target_mode(path):
+    """Permission bits the file at path should keep: its current ones, or the default for a new file"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_bytes(path, data, fsync=False):
+    """
+    Write data to path through a temp file in the same directory and os.replace
+    Readers (and a crashed run) see either the old file or the new one, never a truncated file
+    An existing file keeps its permission bits
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, _target_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_text(path, text, encoding='utf-8', fsync=False):
+    atomic_write_bytes(path, text.encode(encoding), fsync=fsync)
+
+
+def atomic_write_json(path, data, fsync=False, **kwargs):
+    atomic_write_text(path, json.dumps(data, **kwargs), fsync=fsync)
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QPainter, QImage
+from PyQt5.QtCore import Qt, QPoint
+
+from styles import CLASS_STYLES, DEFAULT_STYLE, group_by_style
+from main import style_pen, draw_quad_batch
+
+
+def random_quads(count, width, height, max_size=30, num_classes=16, seed=0):
+    """Synthetic screen-space quads and class ids, roughly like a dense DOTA image"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(max_size, [width - max_size, height - max_size], (count, 1, 2))
+    quads = (centers + rng.uniform(-max_size / 2, max_size / 2, (count, 4, 2))).astype(np.int32)
+    classes = rng.integers(0, num_classes, count)
+    return quads, classes
+
+
+def paint_per_polygon(painter, quads, classes):
+    """The original loop: one setPen and four drawLine calls per polygon"""
+    for class_id, quad in zip(classes.tolist(), quads.tolist()):
+        painter.setPen(style_pen(CLASS_STYLES.get(class_id, DEFAULT_STYLE)))
+        points = [QPoint(x, y) for x, y in quad]
+        for j in range(4):
+            painter.drawLine(points[j], points[(j+1)%4])
+
+
+def paint_batched(painter, quads, classes):
+    """One setPen and one batch per pen style"""
+    for style, class_ids in group_by_style(np.unique(classes).tolist()):
+        painter.setPen(style_pen(style))
+        draw_quad_batch(painter, quads[np.isin(classes, class_ids)])
+
+
+def time_frame(paint, quads, classes, width, height, repeat):
+    """Best of `repeat` frames in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        start = time.perf_counter()
+        paint(painter, quads, classes)
+        painter.end()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare per-polygon and batched overlay painting")
+    parser.add_argument("--counts", type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication(sys.argv[:1])
+
+    print(f"{'polygons':>10} {'per-polygon ms':>16} {'batched ms':>12} {'speedup':>8}")
+    for count in args.counts:
+        quads, classes = random_quads(count, args.width, args.height)
+        old = time_frame(paint_per_polygon, quads, classes, args.width, args.height, args.repeat)
+        new = time_frame(paint_batched, quads, classes, args.width, args.height, args.repeat)
+        print(f"{count:>10} {old:>16.1f} {new:>12.1f} {old / new:>7.2f}x")
@@ -0,0 +1,246 @@
+import os
+import json
+import fnmatch
+import hashlib
+import threading
+
+from atomic_io import atomic_write_json
+
+
+# Image extensions in lookup priority order, used when several images share a stem
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tiff')
+
+
+def _scan_stems(directory, extensions, on_entry=None, stats=None):
+    """
+    stem -> file name for files with one of extensions (lowest index wins), in directory order
+    If stats is a dict, it is filled with stem -> stat result of the chosen file
+    """
+    priority = {ext.lower(): i for i, ext in enumerate(extensions)}
+    names = {}
+    ranks = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            rank = priority.get(ext.lower())
+            if rank is None or rank >= ranks.get(stem, len(priority)):
+                continue
+            if not entry.is_file():
+                continue
+            names[stem] = entry.name
+            ranks[stem] = rank
+            if stats is not None:
+                stats[stem] = entry.stat()
+            if on_entry is not None:
+                on_entry(stem, entry.name)
+    return names
+
+
+def index_images(image_dir, extensions=IMAGE_EXTENSIONS, stats=None):
+    """
+    Scan image_dir once and build a stem -> image path index
+    Extensions are matched case-insensitively; if a stem exists with several
+    extensions, the one that comes first in `extensions` wins
+    Pass a dict as stats to also collect stem -> stat result from the same scan
+    """
+    return {stem: os.path.join(image_dir, name) for stem, name in _scan_stems(image_dir, extensions, stats=stats).items()}
+
+
+CATALOG_VERSION = 1
+DEFAULT_CATALOG_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "obbe", "catalog")
+
+
+class DatasetPairs:
+    """Immutable snapshot of paired stems, sorted, with O(1) index <-> stem lookups"""
+    def __init__(self, image_dir, label_dir, label_extension, images):
+        self.image_dir = image_dir
+        self.label_dir = label_dir
+        self.label_extension = label_extension
+        self.images = images  # stem -> image file name
+        self.stems = sorted(images)
+        self.positions = {stem: i for i, stem in enumerate(self.stems)}
+
+    def __len__(self):
+        return len(self.stems)
+
+    def paths(self, index):
+        """(image path, label path) of the pair at index"""
+        stem = self.stems[index]
+        return (os.path.join(self.image_dir, self.images[stem]),
+                os.path.join(self.label_dir, stem + self.label_extension))
+
+    def index_of(self, stem):
+        return self.positions.get(stem)
+
+
+class DatasetCatalog:
+    """
+    Stem-keyed image/label pairs of a dataset, sorted by stem
+    The pairing is cached on disk and reused as long as the modification times of both
+    directories are unchanged. Otherwise the directories are scanned on a background thread,
+    and the first pair found is published right away, so a viewer can show something
+    before a huge directory is fully enumerated. Until `complete` is set, `pairs` only
+    holds the pairs found so far; every update swaps in a new DatasetPairs snapshot.
+    """
+    def __init__(self, image_dir, label_dir, image_extensions=IMAGE_EXTENSIONS, label_extension='.txt',
+                 cache_dir=DEFAULT_CATALOG_CACHE_DIR, on_complete=None):
+        self.image_dir = image_dir
+        self.label_dir = label_dir
+        self.image_extensions = tuple(image_extensions)
+        self.label_extension = label_extension
+        self.on_complete = on_complete
+        key = f"{os.path.abspath(image_dir)}|{os.path.abspath(label_dir)}|{self.image_extensions}|{label_extension}"
+        self.cache_path = os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+        self.pairs = DatasetPairs(image_dir, label_dir, label_extension, {})
+        self.unpaired_images = 0
+        self.unpaired_labels = 0
+        self.complete = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def _mtimes(self):
+        return os.stat(self.image_dir).st_mtime_ns, os.stat(self.label_dir).st_mtime_ns
+
+    def start(self):
+        """Load the cached catalog, or start scanning in the background when it is stale"""
+        mtimes = self._mtimes()
+        if self._load_cache(mtimes):
+            return self
+        self.thread = threading.Thread(target=self._scan, args=(mtimes,), name="DatasetCatalog", daemon=True)
+        self.thread.start()
+        return self
+
+    def wait_first(self, timeout=None):
+        """Block until at least one pair is known or the scan is done; True if there is a pair"""
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.pairs) or self.complete, timeout)
+            return len(self.pairs) > 0
+
+    def wait(self, timeout=None):
+        with self.condition:
+            return self.condition.wait_for(lambda: self.complete, timeout)
+
+    def _load_cache(self, mtimes):
+        try:
+            with open(self.cache_path, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if cache.get("version") != CATALOG_VERSION or cache.get("mtimes") != list(mtimes):
+            return False
+        self._publish(dict(cache["pairs"]), cache["unpaired_images"], cache["unpaired_labels"])
+        return True
+
+    def _publish(self, images, unpaired_images, unpaired_labels):
+        pairs = DatasetPairs(self.image_dir, self.label_dir, self.label_extension, images)
+        with self.condition:
+            self.pairs = pairs
+            self.unpaired_images = unpaired_images
+            self.unpaired_labels = unpaired_labels
+            self.complete = True
+            self.condition.notify_all()
+
+    def _scan(self, mtimes):
+        def publish_first(stem, name):
+            # Until the first pair is out, check each image for a label of the same stem
+            if len(self.pairs):
+                return
+            if os.path.isfile(os.path.join(self.label_dir, stem + self.label_extension)):
+                first = DatasetPairs(self.image_dir, self.label_dir, self.label_extension, {stem: name})
+                with self.condition:
+                    self.pairs = first
+                    self.condition.notify_all()
+
+        try:
+            images = _scan_stems(self.image_dir, self.image_extensions, publish_first)
+            labels = _scan_stems(self.label_dir, (self.label_extension,))
+        except OSError as e:
+            # Nothing is cached, the next start scans again
+            print(f"Error: Failed to scan dataset: {str(e)}")
+            self._publish({}, 0, 0)
+            if self.on_complete is not None:
+                self.on_complete(self)
+            return
+        pairs = {stem: name for stem, name in images.items() if stem in labels}
+        unpaired_images = len(images) - len(pairs)
+        unpaired_labels = len(labels) - len(pairs)
+        if unpaired_images or unpaired_labels:
+            print(f"Warning: {unpaired_images} images without labels and {unpaired_labels} labels without images are skipped")
+
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            atomic_write_json(self.cache_path, {"version": CATALOG_VERSION, "mtimes": list(mtimes),
+                                                "image_dir": os.path.abspath(self.image_dir),
+                                                "label_dir": os.path.abspath(self.label_dir),
+                                                "unpaired_images": unpaired_images,
+                                                "unpaired_labels": unpaired_labels,
+                                                "pairs": sorted(pairs.items())})
+        except OSError as e:
+            print(f"Warning: Failed to save dataset catalog {self.cache_path}: {str(e)}")
+
+        self._publish(pairs, unpaired_images, unpaired_labels)
+        if self.on_complete is not None:
+            self.on_complete(self)
+
+
+def _scan_folder(folder, extensions, exclude):
+    """Sorted image names of one folder that pass the extension and exclude rules"""
+    names = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith('.') or not name.lower().endswith(extensions) or any(pattern in name for pattern in exclude):
+                continue
+            if entry.is_file():
+                names.append(name)
+    names.sort()
+    return names
+
+
+def iter_image_tree(base_dir, folder_pattern="result_*", extensions=('.jpg', '.jpeg', '.png', '.bmp'),
+                    exclude=("cv_",), cache_dir=DEFAULT_CATALOG_CACHE_DIR):
+    """
+    Yield the images of every folder_pattern folder under base_dir, folders and files sorted
+    Files whose name contains one of the exclude substrings are skipped. Folder listings are
+    cached across runs and reused while the folder's mtime is unchanged, so a warm start
+    costs one stat per folder; images are yielded as soon as their folder is known, so the
+    first one is available before the whole tree is listed. The cache is saved once the
+    generator is exhausted.
+    """
+    extensions = tuple(ext.lower() for ext in extensions)
+    key = f"{os.path.abspath(base_dir)}|{folder_pattern}|{extensions}|{tuple(exclude)}"
+    cache_path = os.path.join(cache_dir, "tree_" + hashlib.sha1(key.encode()).hexdigest() + ".json")
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+        if cache.get("version") != CATALOG_VERSION:
+            cache = {}
+    except (OSError, ValueError):
+        cache = {}
+    cached_folders = cache.get("folders", {})
+
+    with os.scandir(base_dir) as entries:
+        folders = sorted(entry.name for entry in entries
+                         if fnmatch.fnmatch(entry.name, folder_pattern) and entry.is_dir())
+
+    listings = {}
+    for folder in folders:
+        path = os.path.join(base_dir, folder)
+        mtime = os.stat(path).st_mtime_ns
+        cached = cached_folders.get(folder)
+        if cached is not None and cached[0] == mtime:
+            names = cached[1]
+        else:
+            names = _scan_folder(path, extensions, exclude)
+        listings[folder] = [mtime, names]
+        for name in names:
+            yield os.path.join(path, name)
+
+    if listings != cached_folders:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            atomic_write_json(cache_path, {"version": CATALOG_VERSION, "base_dir": os.path.abspath(base_dir),
+                                           "folders": listings})
+        except OSError as e:
+            print(f"Warning: Failed to save image catalog {cache_path}: {str(e)}")
@@ -1,48 +1,186 @@
 import os
-import glob
+import sys
+import json
+import argparse
 
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def convert_class_numbers(directory_path='.'):
+from atomic_io import atomic_write_text
+
+
+def load_mapping(path):
     """
-    현재 디렉토리의 모든 txt 파일에서 클래스 번호 0을 10으로 변경합니다.
-    
+    JSON 또는 YAML 파일에서 클래스 매핑 테이블을 읽습니다.
+    {"0": 10, "3": 5} 형식이며, YAML은 PyYAML이 설치된 경우에만 지원합니다.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit("YAML 매핑 파일을 읽으려면 PyYAML이 필요합니다 (pip install pyyaml)")
+            table = yaml.safe_load(f)
+        else:
+            table = json.load(f)
+    return {int(old): int(new) for old, new in table.items()}
+
+
+def parse_mapping_args(pairs):
+    """["0:10", "3:5"] 형식의 CLI 인자를 {0: 10, 3: 5}로 변환합니다."""
+    mapping = {}
+    for pair in pairs:
+        old, sep, new = pair.partition(':')
+        if not sep:
+            raise SystemExit(f"잘못된 매핑: {pair} (예: 0:10)")
+        mapping[int(old)] = int(new)
+    return mapping
+
+
+def find_label_files(directory_path, recursive=False):
+    """directory_path의 txt 파일 목록 (recursive=True이면 하위 폴더 포함)"""
+    txt_files = []
+    stack = [directory_path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if recursive:
+                        stack.append(entry.path)
+                elif entry.name.endswith('.txt') and entry.is_file():
+                    txt_files.append(entry.path)
+    txt_files.sort()
+    return txt_files
+
+
+def remap_file(txt_file, mapping, dry_run=False):
+    """
+    한 파일의 첫 번째 토큰(클래스)을 mapping에 따라 바꿉니다.
+    각 줄의 첫 토큰만 확인하며, 바뀌는 줄이 없는 파일은 다시 쓰지 않습니다.
+    나머지 토큰과 줄바꿈은 그대로 유지됩니다.
+
+    Returns:
+        Counter: (기존 클래스, 새 클래스) -> 변경된 줄 수
+    """
+    # 문자열 비교만으로 확인할 수 있도록 키를 토큰 형태로 변환
+    table = {str(old): str(new) for old, new in mapping.items() if old != new}
+    with open(txt_file, 'r', encoding='utf-8', newline='') as f:
+        lines = f.read().splitlines(keepends=True)
+
+    changes = Counter()
+    new_lines = None
+    for i, line in enumerate(lines):
+        stripped = line.lstrip()
+        token = stripped.split(None, 1)[0] if stripped else None
+        new_token = table.get(token)
+        if new_token is None:
+            continue
+        if new_lines is None:
+            new_lines = list(lines)
+        indent = line[:len(line) - len(stripped)]
+        new_lines[i] = indent + new_token + stripped[len(token):]
+        changes[(int(token), int(new_token))] += 1
+
+    if new_lines is not None and not dry_run:
+        atomic_write_text(txt_file, ''.join(new_lines))
+    return changes
+
+
+def _remap_chunk(txt_files, mapping, dry_run):
+    results = []
+    for txt_file in txt_files:
+        try:
+            results.append((txt_file, remap_file(txt_file, mapping, dry_run), None))
+        except (OSError, UnicodeDecodeError) as e:
+            results.append((txt_file, None, str(e)))
+    return results
+
+
+def remap_classes(directory_path, mapping, recursive=False, workers=1, dry_run=False, chunk_size=None, verbose=True):
+    """
+    디렉토리의 모든 txt 라벨 파일에서 클래스 번호를 mapping에 따라 변경합니다.
+
     Args:
         directory_path (str): 처리할 텍스트 파일이 있는 디렉토리 경로
+        mapping (dict): 기존 클래스 -> 새 클래스 (예: {0: 10})
+        recursive (bool): 하위 디렉토리까지 처리할지 여부
+        workers (int): 병렬 처리 프로세스 수
+        dry_run (bool): True이면 파일을 쓰지 않고 변경 내역만 보고
+
+    Returns:
+        Counter: (기존 클래스, 새 클래스) -> 변경된 줄 수
     """
-    # txt 파일 목록 가져오기
-    txt_files = glob.glob(os.path.join(directory_path, '*.txt'))
-    
+    txt_files = find_label_files(directory_path, recursive)
+
     if not txt_files:
         print("현재 디렉토리에 텍스트 파일이 없습니다.")
-        return
-    
+        return Counter()
+
+    totals = Counter()
     modified_count = 0
-    
-    for txt_file in txt_files:
-        modified = False
-        new_lines = []
-        
-        # 파일 읽기
-        with open(txt_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        # 각 줄 처리
-        for line in lines:
-            parts = line.strip().split()
-            if parts and parts[0] == '0':  # 첫 번째 숫자(클래스)가 0인 경우
-                parts[0] = '10'  # 0을 10으로 변경
-                modified = True
-            new_lines.append(' '.join(parts) + '\n')
-        
-        # 변경된 내용이 있는 경우에만 파일 쓰기
-        if modified:
-            with open(txt_file, 'w', encoding='utf-8') as f:
-                f.writelines(new_lines)
-            modified_count += 1
-            print(f"수정됨: {txt_file}")
-    
-    print(f"\n처리 완료!")
-    print(f"총 {len(txt_files)}개의 파일 중 {modified_count}개 파일이 수정되었습니다.")
+    failed_count = 0
+
+    def record(results):
+        nonlocal modified_count, failed_count
+        for txt_file, changes, error in results:
+            if error is not None:
+                failed_count += 1
+                print(f"실패: {txt_file}: {error}")
+            elif changes:
+                totals.update(changes)
+                modified_count += 1
+                if verbose:
+                    print(f"{'수정 예정' if dry_run else '수정됨'}: {txt_file}")
+
+    if workers > 1 and len(txt_files) > 1:
+        if chunk_size is None:
+            chunk_size = max(1, min(512, len(txt_files) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_remap_chunk, txt_files[i:i + chunk_size], mapping, dry_run)
+                       for i in range(0, len(txt_files), chunk_size)]
+            for future in as_completed(futures):
+                record(future.result())
+    else:
+        record(_remap_chunk(txt_files, mapping, dry_run))
+
+    print(f"\n{'확인 완료 (dry run, 파일은 변경되지 않음)' if dry_run else '처리 완료!'}")
+    print(f"총 {len(txt_files)}개의 파일 중 {modified_count}개 파일이 {'수정될 예정입니다' if dry_run else '수정되었습니다'}.")
+    if failed_count:
+        print(f"{failed_count}개 파일을 처리하지 못했습니다.")
+    for (old, new), count in sorted(totals.items()):
+        print(f"  클래스 {old} -> {new}: {count}개")
+    return totals
+
+
+def convert_class_numbers(directory_path='.'):
+    """
+    현재 디렉토리의 모든 txt 파일에서 클래스 번호 0을 10으로 변경합니다.
+
+    Args:
+        directory_path (str): 처리할 텍스트 파일이 있는 디렉토리 경로
+    """
+    return remap_classes(directory_path, {0: 10})
+
 
 if __name__ == "__main__":
-    convert_class_numbers()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="라벨 파일의 클래스 번호 변경")
+    parser.add_argument("directory", nargs='?', default='.', help="라벨 파일 디렉토리")
+    parser.add_argument("-m", "--map", action="append", default=[], help="기존:새 클래스 (예: -m 0:10 -m 3:5)")
+    parser.add_argument("--mapping", help="JSON/YAML 매핑 파일 ({\"0\": 10})")
+    parser.add_argument("-r", "--recursive", action="store_true", help="하위 디렉토리 포함")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="병렬 프로세스 수")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="파일을 쓰지 않고 변경 내역만 출력")
+    parser.add_argument("-q", "--quiet", action="store_true", help="파일별 출력 생략")
+    args = parser.parse_args()
+
+    mapping = load_mapping(args.mapping) if args.mapping else {}
+    mapping.update(parse_mapping_args(args.map))
+    if not mapping:
+        # 예전 동작: 0 -> 10
+        mapping = {0: 10}
+    if not any(old != new for old, new in mapping.items()):
+        print("변경할 클래스가 없습니다.")
+        sys.exit(0)
+
+    remap_classes(args.directory, mapping, recursive=args.recursive, workers=args.workers,
+                  dry_run=args.dry_run, verbose=not args.quiet)
@@ -0,0 +1,126 @@
+import threading
+import numpy as np
+
+from yolo_labels import read_yolo_obb_labels
+
+
+class IndexFilter:
+    """
+    Navigation restricted to a subset of dataset indices
+    Next and previous matches of every index are precomputed, so each step is one array lookup
+    """
+    def __init__(self, matches, count, label=""):
+        self.matches = np.unique(np.asarray(matches, dtype=np.int64))
+        self.count = count
+        self.label = label
+        if len(self.matches) == 0:
+            self.next_index = self.prev_index = None
+            return
+        positions = np.arange(count)
+        # First match strictly after / last match strictly before every index, wrapping around
+        after = np.searchsorted(self.matches, positions, side='right')
+        before = np.searchsorted(self.matches, positions, side='left') - 1
+        self.next_index = self.matches[after % len(self.matches)]
+        self.prev_index = self.matches[before % len(self.matches)]
+        self.position = np.full(count, -1, dtype=np.int64)
+        self.position[self.matches] = np.arange(len(self.matches))
+
+    def __len__(self):
+        return len(self.matches)
+
+    def next(self, index):
+        """First match after index, wrapping around; indices outside 0..count-1 get the first match"""
+        if self.next_index is None:
+            return None
+        if not 0 <= index < self.count:
+            return int(self.matches[0])
+        return int(self.next_index[index])
+
+    def previous(self, index):
+        """Last match before index, wrapping around; indices outside 0..count-1 get the last match"""
+        if self.prev_index is None:
+            return None
+        if not 0 <= index < self.count:
+            return int(self.matches[-1])
+        return int(self.prev_index[index])
+
+    def rank(self, index):
+        """1-based position of index among the matches, or None if it does not match"""
+        if self.next_index is None or not 0 <= index < self.count or self.position[index] < 0:
+            return None
+        return int(self.position[index]) + 1
+
+
+class ClassIndex:
+    """
+    Inverted index class id -> stems containing it, plus per-stem class counts
+    Built from the label files on a background thread; update() keeps it current after saves.
+    """
+    def __init__(self, pairs, on_complete=None):
+        self.pairs = pairs
+        self.on_complete = on_complete
+        self.counts = {}  # stem -> {class id: count}
+        self.stems_by_class = {}  # class id -> set of stems
+        self.built = 0
+        self.complete = False
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._build, name="ClassIndex", daemon=True)
+        self.thread.start()
+        return self
+
+    def _build(self):
+        for index, stem in enumerate(self.pairs.stems):
+            label_path = self.pairs.paths(index)[1]
+            try:
+                classes, _ = read_yolo_obb_labels(label_path)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Class index skips {label_path}: {str(e)}")
+                continue
+            # Saves from the viewer during the build already registered the newer counts
+            with self.lock:
+                if stem not in self.counts:
+                    self._set(stem, classes)
+                self.built = index + 1
+        with self.lock:
+            self.complete = True
+        print(f"Class index ready: {len(self.counts)} files, {len(self.stems_by_class)} classes")
+        if self.on_complete is not None:
+            self.on_complete(self)
+
+    def _set(self, stem, classes):
+        for class_id in self.counts.get(stem, ()):
+            stems = self.stems_by_class[class_id]
+            stems.discard(stem)
+            if not stems:
+                del self.stems_by_class[class_id]
+        class_ids, counts = np.unique(np.asarray(classes, dtype=np.int64), return_counts=True)
+        self.counts[stem] = dict(zip(class_ids.tolist(), counts.tolist()))
+        for class_id in self.counts[stem]:
+            self.stems_by_class.setdefault(class_id, set()).add(stem)
+
+    def update(self, stem, classes):
+        """
+        Replace the counts of one file after it was edited
+        Returns True if the set of classes in the file changed, i.e. filters need a rebuild
+        """
+        with self.lock:
+            old = set(self.counts.get(stem, ()))
+            self._set(stem, classes)
+            return old != set(self.counts[stem])
+
+    def counts_for(self, stem):
+        with self.lock:
+            return dict(self.counts.get(stem, {}))
+
+    def filter(self, class_ids):
+        """IndexFilter over the dataset indices of the files containing any of class_ids"""
+        with self.lock:
+            stems = set()
+            for class_id in class_ids:
+                stems.update(self.stems_by_class.get(class_id, ()))
+        matches = [self.pairs.index_of(stem) for stem in stems]
+        label = "class " + ",".join(str(class_id) for class_id in sorted(class_ids))
+        return IndexFilter([i for i in matches if i is not None], len(self.pairs), label)
@@ -1,18 +1,23 @@
 import os
 import cv2
-import json
+import time
 import argparse
-import numpy as np
+import threading
 
-from glob import glob
 from PySide6.QtCore import QSettings
 
+from point_index import PointIndex
+from annotation_store import AnnotationStore
+from catalog import iter_image_tree
+
 
 setting = QSettings("test", "test")
 print(f"마지막으로 저장한 Index: {setting.value('CurrentIndex')}")
 
 parser = argparse.ArgumentParser()
 parser.add_argument("-g", "--go", dest="go", action="store_true")
+parser.add_argument("--import-json", dest="import_json", action="store_true",
+                    help="기존 <timestamp>.json 파일을 annotation store로 가져오기")
 args = parser.parse_args()
 
 drawing = False
@@ -28,28 +33,8 @@ polygon_points = []
 object_point = []
 erase_mode = False
 polygon_mode = False
-
-
-def distance(pt1, pt2):
-    return np.sqrt((pt1[0] - pt2[0]) ** 2 + (pt1[1] - pt2[1]) ** 2)
-
-
-def point_line_distance(pt: tuple, line_start: list, line_end: list):
-    line_mag = distance(line_start, line_end)
-    if line_mag < 0.000001:
-        return distance(pt, line_start)
-
-    u = ((pt[0] - line_start[0]) * (line_end[0] - line_start[0]) +
-         (pt[1] - line_start[1]) * (line_end[1] - line_start[1])) / (line_mag ** 2)
-
-    if u < 0.00001 or u > 1:
-        ix = distance(pt, line_start)
-        iy = distance(pt, line_end)
-        return min(ix, iy)
-    else:
-        intersection = (line_start[0] + u * (line_end[0] - line_start[0]),
-                        line_start[1] + u * (line_end[1] - line_start[1]))
-        return distance(pt, intersection)
+# Grid hash over point_list for erase hit tests, rebuilt whenever point_list is replaced
+point_index = PointIndex()
 
 
 def draw_point(event, x, y, flags, param):
@@ -80,14 +65,18 @@ def draw_point(event, x, y, flags, param):
 
     elif erase_mode:
         if event == cv2.EVENT_LBUTTONDOWN:
-            click_point = (x, y)
             threshold = 8
 
-            for points in point_list:
-                for point in points:
-                    dist = distance(click_point, point)
-                    if dist <= threshold:
-                        print(f"Point: {points}")
+            # Closest point or segment only, then drop its object from memory and the saved json
+            hit = point_index.nearest(x, y, threshold)
+            if hit is not None:
+                i, kind, _, dist = hit
+                print(f"Point: {point_list[i]} ({kind}, {dist:.1f}px)")
+                del point_list[i]
+                point_index.remove(i)
+                save_point()
+                # Redraw only; reloading through show_current_image would rebuild the index
+                draw_current_image(point_list)
     else:
         if event == cv2.EVENT_LBUTTONDOWN:
             drawing = True
@@ -99,81 +88,108 @@ def draw_point(event, x, y, flags, param):
             object_point.extend([[ix, iy]])
             if len(object_point) % 2 == 0:
                 point_list.append(object_point)
+                point_index.add(object_point)
                 object_point = []
             cv2.circle(img, (ix, iy), 1, (0, 0, 255), 1)
             cv2.imshow('image', img)
 
 
 base_path = "result_YOLO8OBB/culture"
-result_folders = glob(os.path.join(base_path, "result_*"))
-result_folders.sort()
 
+# result_* 폴더의 이미지 목록은 백그라운드에서 채워지고, 필요한 이미지가 나오는 즉시 창을 띄움
 image_files = []
-for folder in result_folders:
-    images = []
-
-    for ext in ['*.jpg', '*.jpeg', '*.png', '*.bmp']:
-        images.extend(glob(os.path.join(folder, ext)))
-
-    image_files.extend(sorted(images))
-for file in image_files:
-    fname = file.split('\\')
-    if "cv_" in fname[-1]:
-        image_files.remove(file)
+catalog_done = threading.Event()
+catalog_changed = threading.Condition()
+
+
+def load_image_catalog():
+    try:
+        for image_file in iter_image_tree(base_path, "result_*", ('.jpg', '.jpeg', '.png', '.bmp'), exclude=("cv_",)):
+            with catalog_changed:
+                image_files.append(image_file)
+                catalog_changed.notify_all()
+    finally:
+        with catalog_changed:
+            catalog_done.set()
+            catalog_changed.notify_all()
+
+
+threading.Thread(target=load_image_catalog, daemon=True).start()
+with catalog_changed:
+    catalog_changed.wait_for(lambda: len(image_files) > current_img_index or catalog_done.is_set())
+if image_files and current_img_index >= len(image_files):
+    current_img_index = 0
 
 if not image_files:
     print("No images found in the specified directories")
     exit()
 
+
+def legacy_json_path(image_path):
+    """Per-folder <timestamp>.json the points used to be saved to"""
+    folder = os.path.dirname(image_path)
+    timestamp = os.path.basename(folder).split("_")[-1]
+    return os.path.join(folder, f"{timestamp}.json")
+
+
+# 모든 이미지의 point를 하나의 SQLite(WAL) 파일에 저장
+store = AnnotationStore(os.path.join(base_path, "annotations.sqlite3"), root=base_path)
+# 기존 json은 처음 한 번만 가져옴 (--import-json으로 다시 가져오기)
+if store.get_meta("json_imported") is None or args.import_json:
+    # 가져오기는 전체 이미지 목록이 필요함
+    catalog_done.wait()
+    imported = store.import_json_files((image, legacy_json_path(image)) for image in image_files)
+    store.set_meta("json_imported", time.time())
+    print(f"Imported {imported} json annotation files")
+coverage_reported = False
+
 cv2.namedWindow('image', cv2.WINDOW_FULLSCREEN)
 cv2.setMouseCallback('image', draw_point)
 
 
-def show_current_image():
-    global img, img_copy, point_list
+def draw_current_image(points):
+    """Draw points on a fresh copy of the current image, show it and write the snapshot"""
+    global img, img_copy
 
     img = cv2.imread(image_files[current_img_index])
     img_copy = img.copy()
-    print(f"\nCurrent image: {image_files[current_img_index]}")
-    timestamp = image_files[current_img_index].split("\\")[1].split("_")[-1]
+    for point in points:
+        for x, y in point:
+            cv2.circle(img, (x, y), 1, (0, 0, 255), 2)
+        text_size, _ = cv2.getTextSize(f"{x, y}", cv2.FONT_ITALIC, 0.4, 1)
+        text_w, text_h = text_size
+        cv2.rectangle(img, (x, y), (x + text_w, y - text_h), (255, 255, 255), -1)
+        cv2.putText(img, f"{x, y}", (x, y), cv2.FONT_ITALIC, 0.4, (0, 0, 255), 1)
 
-    if os.path.isfile(f"{result_folders[current_img_index]}/{timestamp}.json"):
-        isfile = "O"
-        with open(f"{result_folders[current_img_index]}/{timestamp}.json", "r") as f:
-            pt = json.load(f)
-            points = pt["points"]
-            point_list = points
-        for point in points:
-            for x, y in point:
-                cv2.circle(img, (x, y), 1, (0, 0, 255), 2)
-            text_size, _ = cv2.getTextSize(f"{x, y}", cv2.FONT_ITALIC, 0.4, 1)
-            text_w, text_h = text_size
-            cv2.rectangle(img, (x, y), (x + text_w, y - text_h), (255, 255, 255), -1)
-            cv2.putText(img, f"{x, y}", (x, y), cv2.FONT_ITALIC, 0.4, (0, 0, 255), 1)
+    cv2.imshow('image', img)
+    image_name = image_files[current_img_index].split("\\")[-2]
+    cv2.imwrite(f"images/{image_name}.jpg", img)
+
+
+def show_current_image():
+    global point_list
 
+    print(f"\nCurrent image: {image_files[current_img_index]}")
 
+    points = store.get(image_files[current_img_index])
+    if points is not None:
+        isfile = "O"
+        point_list = points
     else:
         isfile = "X"
+    # point_list was replaced, so the erase index starts over; erase itself updates it in place
+    point_index.rebuild(point_list)
 
     print(f"Image {current_img_index + 1}/{len(image_files)} [{isfile}]")
 
-    cv2.imshow('image', img)
-    image_name = image_files[current_img_index].split("\\")[-2]
-    cv2.imwrite(f"images/{image_name}.jpg", img)
+    draw_current_image(points or [])
 
 
 def save_point():
     global data, point_list
 
-    timestamp = image_files[current_img_index].split("\\")[1].split("_")[-1]
     data = {"points": point_list}
-    path = os.path.join(image_files[current_img_index].split("\\")[0], image_files[current_img_index].split("\\")[1])
-
-    for i in data:
-        data["points"] = f"'{data['points']}'"
-
-    with open(f"{path}/{timestamp}.json", "w") as f:
-        f.write(json.dumps(data, indent=4).replace("'\"", "").replace("\"'", ""))
+    store.save(image_files[current_img_index], point_list)
     print('save boxes')
 
     setting.setValue("CurrentIndex", current_img_index + 1)
@@ -196,6 +212,7 @@ def create_polygon():
 def clear_box():
     global data, point_list
     point_list.clear()
+    point_index.rebuild(point_list)
 
 
 show_current_image()
@@ -203,6 +220,11 @@ show_current_image()
 while True:
     key = cv2.waitKey(1) & 0xFF
 
+    if not coverage_reported and catalog_done.is_set():
+        annotated, total = store.coverage(image_files)
+        print(f"Annotated images: {annotated}/{total}")
+        coverage_reported = True
+
     if key == ord('a') or key == ord('A'):
         current_img_index = (current_img_index - 1) % len(image_files)
         clear_box()
@@ -232,4 +254,5 @@ while True:
     elif key == 27 or key == ord('q'):
         break
 
+store.close()
 cv2.destroyAllWindows()
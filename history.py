@@ -0,0 +1,82 @@
+from collections import OrderedDict, deque
+
+
+# Edit operations are small tuples with the old and new values of what changed
+#   ("vertex", polygon index, vertex index, (old x, old y), (new x, new y))
+#   ("class", polygon index, old class, new class)
+#   ("delete", polygon index, (8 normalized coordinates), class)
+VERTEX = "vertex"
+CLASS = "class"
+DELETE = "delete"
+
+
+def apply_edit(store, op, undo):
+    """
+    Apply op (or revert it when undo is True) to a PolygonStore
+    Returns the index of the polygon that changed and whether it exists afterwards
+    """
+    kind, i = op[0], op[1]
+    if kind == VERTEX:
+        _, _, vertex, old, new = op
+        store.set_vertex(i, vertex, *(old if undo else new))
+        return i, True
+    if kind == CLASS:
+        _, _, old, new = op
+        store.set_class(i, old if undo else new)
+        return i, True
+    if kind == DELETE:
+        _, _, coords, class_id = op
+        if undo:
+            store.insert(i, coords, class_id)
+            return i, True
+        store.delete(i)
+        return i, False
+    raise ValueError(f"Unknown edit operation: {kind}")
+
+
+class EditHistory:
+    """
+    Undo and redo stacks of one label file
+    Only the deltas are stored and the undo stack is bounded, so a long session
+    keeps at most max_ops operations per file. Recording a new edit clears redo.
+    """
+    def __init__(self, max_ops=500):
+        self.undo_stack = deque(maxlen=max_ops)
+        self.redo_stack = []
+
+    def record(self, op):
+        self.undo_stack.append(op)
+        self.redo_stack.clear()
+
+    def undo(self, store):
+        """Revert the last edit; returns (op, polygon index, exists) or None if there is nothing to undo"""
+        if not self.undo_stack:
+            return None
+        op = self.undo_stack.pop()
+        self.redo_stack.append(op)
+        return (op,) + apply_edit(store, op, undo=True)
+
+    def redo(self, store):
+        """Re-apply the last undone edit; returns (op, polygon index, exists) or None"""
+        if not self.redo_stack:
+            return None
+        op = self.redo_stack.pop()
+        self.undo_stack.append(op)
+        return (op,) + apply_edit(store, op, undo=False)
+
+
+class EditHistoryCache:
+    """Per-file EditHistory, keeping only the max_files most recently edited files"""
+    def __init__(self, max_files=100, max_ops=500):
+        self.max_files = max_files
+        self.max_ops = max_ops
+        self.histories = OrderedDict()
+
+    def get(self, path):
+        history = self.histories.get(path)
+        if history is None:
+            history = self.histories[path] = EditHistory(self.max_ops)
+            while len(self.histories) > self.max_files:
+                self.histories.popitem(last=False)
+        self.histories.move_to_end(path)
+        return history
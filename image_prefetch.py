@@ -0,0 +1,197 @@
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+
+from tile_cache import open_image
+from perf import NO_PERF
+
+
+class PrefetchedFile:
+    """Image (QImage or TiledImage), its screen-sized copy and the parsed labels of one dataset entry"""
+    def __init__(self, image, scaled_image, store):
+        self.image = image
+        self.scaled_image = scaled_image
+        self.store = store
+
+    @property
+    def nbytes(self):
+        return self.image.sizeInBytes() + self.scaled_image.sizeInBytes()
+
+
+def load_file(image_path, label_path, screen_width, screen_height, parse_labels, perf=NO_PERF, prefetch=False):
+    """
+    Open and pre-scale one image and parse its labels
+    Safe to call from worker threads: QImage and the tile cache do not need the GUI thread
+    """
+    with perf.measure("decode", prefetch=prefetch):
+        image = open_image(image_path)
+    if image is None:
+        return None
+    with perf.measure("scale", prefetch=prefetch):
+        scaled_image = image.scaled(screen_width, screen_height, Qt.KeepAspectRatio)
+    with perf.measure("parse", prefetch=prefetch) as fields:
+        store = parse_labels(label_path)
+        fields["objects"] = len(store)
+    return PrefetchedFile(image, scaled_image, store)
+
+
+class ImageLRUCache:
+    """LRU cache of PrefetchedFile entries bounded by the total decoded image size"""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry, pinned=()):
+        self.discard(key)
+        self.entries[key] = entry
+        self.total_bytes += entry.nbytes
+        # Evict least recently used entries, but never the ones the viewer is about to show
+        for old_key in list(self.entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if old_key != key and old_key not in pinned:
+                self.discard(old_key)
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.nbytes
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+
+class _PrefetchSignals(QObject):
+    # generation, index, PrefetchedFile or None
+    loaded = pyqtSignal(int, int, object)
+
+
+class _PrefetchTask(QRunnable):
+    def __init__(self, prefetcher, generation, index, image_path, label_path):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.generation = generation
+        self.index = index
+        self.image_path = image_path
+        self.label_path = label_path
+        self.started = False
+
+    def run(self):
+        self.started = True
+        # The user jumped somewhere else while this task was queued
+        if self.generation != self.prefetcher.generation:
+            self.prefetcher.signals.loaded.emit(self.generation, self.index, None)
+            return
+        try:
+            entry = load_file(self.image_path, self.label_path, self.prefetcher.screen_width,
+                              self.prefetcher.screen_height, self.prefetcher.parse_labels,
+                              self.prefetcher.perf, prefetch=True)
+        except Exception as e:
+            print(f"Prefetch failed for {self.image_path}: {str(e)}")
+            entry = None
+        self.prefetcher.signals.loaded.emit(self.generation, self.index, entry)
+
+
+class ImagePrefetcher:
+    """
+    Decode the next and previous `radius` files on a QThreadPool so A/D navigation is a cache hit
+    Results arrive on the GUI thread through a queued signal and go into a memory-bounded LRU cache.
+    Every schedule() starts a new generation: queued tasks are dropped and results of tasks
+    that no longer fall inside the prefetch window are discarded.
+    """
+    def __init__(self, paths_for_index, count, screen_width, screen_height, parse_labels,
+                 radius=2, max_bytes=1024 ** 3, max_threads=2, perf=NO_PERF):
+        self.paths_for_index = paths_for_index
+        self.count = count
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.parse_labels = parse_labels
+        self.radius = radius
+        self.perf = perf
+
+        self.cache = ImageLRUCache(max_bytes)
+        self.generation = 0
+        self.first_valid_generation = 0
+        self.window = ()
+        self.in_flight = {}
+
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.signals = _PrefetchSignals()
+        self.signals.loaded.connect(self._on_loaded)
+
+    def load(self, index):
+        """Return the entry for index, decoding it synchronously on a cache miss"""
+        entry = self.cache.get(index)
+        if entry is None:
+            image_path, label_path = self.paths_for_index(index)
+            entry = load_file(image_path, label_path, self.screen_width, self.screen_height,
+                              self.parse_labels, self.perf)
+            if entry is not None:
+                self.cache.put(index, entry, pinned=self.window)
+        return entry
+
+    def schedule(self, center):
+        """Prefetch the files around center, nearest (and forward) first"""
+        self.generation += 1
+        self.pool.clear()
+        # Tasks that were still queued are gone now and will never report back
+        self.in_flight = {index: task for index, task in self.in_flight.items() if task.started}
+
+        wanted = [center]
+        for step in range(1, self.radius + 1):
+            wanted.append((center + step) % self.count)
+            wanted.append((center - step) % self.count)
+        self.window = tuple(dict.fromkeys(wanted))
+
+        for index in self.window:
+            if index in self.cache or index in self.in_flight:
+                continue
+            image_path, label_path = self.paths_for_index(index)
+            task = _PrefetchTask(self, self.generation, index, image_path, label_path)
+            self.in_flight[index] = task
+            self.pool.start(task)
+
+    def _on_loaded(self, generation, index, entry):
+        task = self.in_flight.get(index)
+        if task is not None and task.generation == generation:
+            del self.in_flight[index]
+        # A result of an older generation is still welcome if the index is in the current window,
+        # but never replaces an entry the viewer already loaded (and may have edited)
+        if generation < self.first_valid_generation:
+            return
+        if entry is None or index not in self.window or index in self.cache:
+            return
+        self.cache.put(index, entry, pinned=self.window)
+
+    def reset(self, count, keep=None):
+        """
+        The index -> file mapping changed: forget everything cached or in flight
+        keep is an optional (new index, entry) that stays cached, e.g. the file on screen
+        """
+        self.count = count
+        self.generation += 1
+        self.pool.clear()
+        self.cache.clear()
+        self.window = ()
+        # Results of tasks still running refer to the old mapping and are dropped when they arrive
+        self.first_valid_generation = self.generation + 1
+        self.in_flight = {}
+        if keep is not None:
+            self.cache.put(*keep)
+
+    def shutdown(self):
+        self.generation += 1
+        self.pool.clear()
+        self.pool.waitForDone()
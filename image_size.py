@@ -0,0 +1,186 @@
+import os
+import json
+import struct
+
+from atomic_io import atomic_write_json
+
+
+def _tiff_ifd_values(data, tags):
+    """
+    Read the requested tags from the first IFD of a TIFF byte stream
+    Only SHORT and LONG values stored inline are supported, which covers
+    ImageWidth/ImageLength and the EXIF Orientation tag
+    """
+    if data[:4] == b'II*\x00':
+        endian = '<'
+    elif data[:4] == b'MM\x00*':
+        endian = '>'
+    else:
+        return {}
+
+    ifd_offset = struct.unpack(endian + 'I', data[4:8])[0]
+    if ifd_offset + 2 > len(data):
+        return {}
+
+    count = struct.unpack(endian + 'H', data[ifd_offset:ifd_offset + 2])[0]
+    return _tiff_ifd_entries(endian, data[ifd_offset + 2:ifd_offset + 2 + count * 12], tags)
+
+
+def _tiff_ifd_entries(endian, data, tags):
+    """Read the requested tags from the 12-byte entries of one IFD (without its count field)"""
+    values = {}
+    for entry in range(0, len(data) - 11, 12):
+        tag, value_type = struct.unpack(endian + 'HH', data[entry:entry + 4])
+        if tag not in tags:
+            continue
+        if value_type == 3:  # SHORT
+            values[tag] = struct.unpack(endian + 'H', data[entry + 8:entry + 10])[0]
+        elif value_type == 4:  # LONG
+            values[tag] = struct.unpack(endian + 'I', data[entry + 8:entry + 12])[0]
+    return values
+
+
+def _png_size(f):
+    header = f.read(24)
+    if len(header) < 24 or header[12:16] != b'IHDR':
+        return None
+    width, height = struct.unpack('>II', header[16:24])
+    return width, height
+
+
+def _bmp_size(f):
+    header = f.read(26)
+    if len(header) < 26:
+        return None
+    dib_size = struct.unpack('<I', header[14:18])[0]
+    if dib_size == 12:  # BITMAPCOREHEADER
+        width, height = struct.unpack('<HH', header[18:22])
+    else:
+        width, height = struct.unpack('<ii', header[18:26])
+    return abs(width), abs(height)
+
+
+def _jpeg_size(f):
+    f.read(2)  # SOI
+    orientation = 1
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        # Fill bytes and standalone markers carry no length field
+        while code == 0xFF:
+            code = f.read(1)[0]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+
+        length = struct.unpack('>H', f.read(2))[0]
+        if code == 0xE1:
+            segment = f.read(length - 2)
+            if segment[:6] == b'Exif\x00\x00':
+                orientation = _tiff_ifd_values(segment[6:], {0x0112}).get(0x0112, 1)
+        elif 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', f.read(5)[1:5])
+            # cv2.imread applies EXIF rotation, so report the rotated size as well
+            if orientation in (5, 6, 7, 8):
+                width, height = height, width
+            return width, height
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def _tiff_size(f):
+    # The first IFD may sit anywhere (often after the strip data), so seek straight to it
+    # and read only its entries
+    header = f.read(8)
+    endian = '<' if header[:2] == b'II' else '>'
+    ifd_offset = struct.unpack(endian + 'I', header[4:8])[0]
+    f.seek(ifd_offset)
+    count = struct.unpack(endian + 'H', f.read(2))[0]
+    values = _tiff_ifd_entries(endian, f.read(count * 12), {256, 257})
+    if 256 not in values or 257 not in values:
+        return None
+    return values[256], values[257]
+
+
+def read_image_size(img_path):
+    """
+    Read (width, height) from the image header without decoding pixel data
+    Supports PNG, JPEG, TIFF and BMP. Returns None for anything else
+    """
+    try:
+        with open(img_path, 'rb') as f:
+            signature = f.read(8)
+            f.seek(0)
+            if signature == b'\x89PNG\r\n\x1a\n':
+                return _png_size(f)
+            if signature[:2] == b'\xff\xd8':
+                return _jpeg_size(f)
+            if signature[:4] in (b'II*\x00', b'MM\x00*'):
+                return _tiff_size(f)
+            if signature[:2] == b'BM':
+                return _bmp_size(f)
+    except (OSError, struct.error, IndexError):
+        return None
+    return None
+
+
+class ImageSizeCache:
+    """
+    Persistent width/height cache keyed by image path, file size and mtime
+    Entries are revalidated with a single stat call, so re-runs never open the images
+    """
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self.entries = {}
+        self.new_entries = {}
+        self.dirty = False
+
+        if cache_path is not None and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                print(f"Warning: Ignoring unreadable size cache {cache_path}")
+                self.entries = {}
+
+    def get(self, img_path, stat=None):
+        """
+        Return (width, height) for img_path, or None if it cannot be read
+        stat may be passed in when the caller already has it, e.g. from a directory scan
+        """
+        key = os.path.abspath(img_path)
+        if stat is None:
+            try:
+                stat = os.stat(img_path)
+            except OSError:
+                return None
+
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2], entry[3]
+
+        size = read_image_size(img_path)
+        if size is None:
+            # Unknown header layout, fall back to a full decode (cv2 is only needed here)
+            import cv2
+            img = cv2.imread(img_path)
+            if img is None:
+                return None
+            size = img.shape[1], img.shape[0]
+
+        self.entries[key] = self.new_entries[key] = [stat.st_size, stat.st_mtime_ns, size[0], size[1]]
+        self.dirty = True
+        return size
+
+    def update(self, entries):
+        """Merge entries probed elsewhere, e.g. by pool workers"""
+        if entries:
+            self.entries.update(entries)
+            self.dirty = True
+
+    def save(self):
+        if self.cache_path is None or not self.dirty:
+            return
+        atomic_write_json(self.cache_path, self.entries)
+        self.dirty = False
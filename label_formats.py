@@ -0,0 +1,26 @@
+# Constants shared by the converter, the linter and the viewer; kept free of heavy imports
+# so the viewer can use them without loading OpenCV or the process pool machinery
+
+
+# DOTA class name -> YOLO OBB class index
+DOTA_CLASSES = {
+    "plane": 0,
+    "ship": 1,
+    "storage tank": 2,
+    "baseball diamond": 3,
+    "tennis court": 4,
+    "basketball court": 5,
+    "ground track field": 6,
+    "harbor": 7,
+    "bridge": 8,
+    "large vehicle": 9,
+    "small vehicle": 10,
+    "helicopter": 11,
+    "roundabout": 12,
+    "soccer ball field": 13,
+    "swimming pool": 14,
+    "container crane": 15
+}
+
+# Format version of the lint_labels.py JSON report
+LINT_REPORT_VERSION = 1
@@ -0,0 +1,143 @@
+import os
+import json
+import argparse
+import shutil
+import numpy as np
+
+from yolo_labels import read_yolo_obb_labels, format_yolo_obb_lines
+from atomic_io import atomic_write_text, atomic_write_json
+
+
+# Packed label shard layout (one directory):
+#   coords.f32   float32 (N, 8) normalized coordinates of every object, image after image
+#   classes.i32  int32 (N,) class index of every object
+#   offsets.i64  int64 (num_images + 1,) objects of image i are offsets[i]:offsets[i + 1]
+#   index.json   format version, image names (label file stems) and object count
+SHARD_VERSION = 1
+
+
+class LabelShardWriter:
+    """
+    Stream per-image labels into a packed shard
+    Data goes to <shard_path>.tmp and replaces shard_path on close(), so readers
+    never see a half-written shard
+    """
+    def __init__(self, shard_path):
+        self.shard_path = shard_path
+        self.tmp_path = f"{shard_path}.tmp"
+        if os.path.exists(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        os.makedirs(self.tmp_path)
+
+        self.coords_file = open(os.path.join(self.tmp_path, "coords.f32"), 'wb')
+        self.classes_file = open(os.path.join(self.tmp_path, "classes.i32"), 'wb')
+        self.names = []
+        self.offsets = [0]
+
+    def add(self, name, class_ids, coords):
+        self.coords_file.write(np.ascontiguousarray(coords, dtype=np.float32).tobytes())
+        self.classes_file.write(np.ascontiguousarray(class_ids, dtype=np.int32).tobytes())
+        self.names.append(name)
+        self.offsets.append(self.offsets[-1] + len(class_ids))
+
+    def close(self):
+        self.coords_file.close()
+        self.classes_file.close()
+        np.array(self.offsets, dtype=np.int64).tofile(os.path.join(self.tmp_path, "offsets.i64"))
+        atomic_write_json(os.path.join(self.tmp_path, "index.json"),
+                          {"version": SHARD_VERSION, "names": self.names, "count": self.offsets[-1]})
+
+        if os.path.exists(self.shard_path):
+            shutil.rmtree(self.shard_path)
+        os.replace(self.tmp_path, self.shard_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.coords_file.close()
+            self.classes_file.close()
+            shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+class LabelShard:
+    """
+    Memory-mapped reader for a packed label shard
+    shard[i] or shard.get(name) returns (classes, coords) views into the mapping, no copies
+    """
+    def __init__(self, shard_path):
+        self.shard_path = shard_path
+        with open(os.path.join(shard_path, "index.json"), 'r') as f:
+            index = json.load(f)
+        if index.get("version") != SHARD_VERSION:
+            raise ValueError(f"Unsupported shard version in {shard_path}: {index.get('version')}")
+
+        self.names = index["names"]
+        self.count = index["count"]
+        self.name_index = {name: i for i, name in enumerate(self.names)}
+        self.offsets = np.fromfile(os.path.join(shard_path, "offsets.i64"), dtype=np.int64)
+
+        # np.memmap refuses empty files, an empty shard gets empty arrays instead
+        if self.count:
+            self.coords = np.memmap(os.path.join(shard_path, "coords.f32"), dtype=np.float32,
+                                    mode='r', shape=(self.count, 8))
+            self.classes = np.memmap(os.path.join(shard_path, "classes.i32"), dtype=np.int32,
+                                     mode='r', shape=(self.count,))
+        else:
+            self.coords = np.empty((0, 8), dtype=np.float32)
+            self.classes = np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.classes[start:end], self.coords[start:end]
+
+    def get(self, name):
+        return self[self.name_index[name]]
+
+
+def pack_label_dir(label_dir, shard_path):
+    """
+    Pack every YOLO OBB .txt file of label_dir (sorted by name) into one shard
+    Returns the number of images packed
+    """
+    label_files = sorted(f for f in os.listdir(label_dir) if f.endswith('.txt'))
+    with LabelShardWriter(shard_path) as writer:
+        for label_file in label_files:
+            class_ids, coords = read_yolo_obb_labels(os.path.join(label_dir, label_file))
+            writer.add(label_file[:-len('.txt')], class_ids, coords)
+    return len(label_files)
+
+
+def export_shard_to_txt(shard_path, output_dir):
+    """
+    Write one YOLO OBB .txt file per image of a shard, for tools that expect the per-file layout
+    Returns the number of files written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shard = LabelShard(shard_path)
+    for i, name in enumerate(shard.names):
+        class_ids, coords = shard[i]
+        lines = format_yolo_obb_lines(class_ids, coords.astype(np.float64))
+        atomic_write_text(os.path.join(output_dir, f"{name}.txt"), "".join(line + "\n" for line in lines))
+    return len(shard)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack YOLO OBB labels into a shard or export a shard back to .txt files")
+    parser.add_argument("command", choices=["pack", "export"])
+    parser.add_argument("source", help="label directory (pack) or shard directory (export)")
+    parser.add_argument("target", help="shard directory (pack) or output label directory (export)")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        count = pack_label_dir(args.source, args.target)
+        print(f"Packed {count} label files into {args.target}")
+    else:
+        count = export_shard_to_txt(args.source, args.target)
+        print(f"Exported {count} label files to {args.target}")
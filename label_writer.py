@@ -0,0 +1,83 @@
+import time
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from atomic_io import atomic_write_text
+from perf import NO_PERF
+
+
+class LabelWriter(QObject):
+    """
+    Background label file writer
+    Saves of the same file within `delay` seconds are merged into one write, files are
+    replaced atomically (temp file + os.replace) and failures are reported through
+    write_failed, which is delivered on the GUI thread.
+    """
+    write_failed = pyqtSignal(str, str)  # path, error message
+
+    def __init__(self, delay=0.3, perf=NO_PERF):
+        super().__init__()
+        self.delay = delay
+        self.perf = perf
+        self.pending = {}  # path -> [text, due time]
+        self.writing = None
+        self.running = True
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name="LabelWriter", daemon=True)
+        self.thread.start()
+
+    def save(self, path, text):
+        """Queue text to be written to path; a newer save of the same path replaces it"""
+        with self.condition:
+            if path in self.pending:
+                # Keep the original deadline so a burst of edits cannot postpone the write forever
+                self.pending[path][0] = text
+            else:
+                self.pending[path] = [text, time.monotonic() + self.delay]
+            self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Write everything that is pending right away and wait until it is on disk"""
+        with self.condition:
+            for entry in self.pending.values():
+                entry[1] = 0
+            self.condition.notify_all()
+            return self.condition.wait_for(lambda: not self.pending and self.writing is None, timeout)
+
+    def close(self):
+        self.flush()
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join()
+
+    def _next_due(self):
+        """Wait for the next due file; returns (path, text) or None once closed"""
+        with self.condition:
+            while True:
+                if not self.running and not self.pending:
+                    return None
+                now = time.monotonic()
+                for path, (text, due) in self.pending.items():
+                    if due <= now:
+                        del self.pending[path]
+                        self.writing = path
+                        return path, text
+                timeout = min(due for _, due in self.pending.values()) - now if self.pending else None
+                self.condition.wait(timeout)
+
+    def _run(self):
+        while True:
+            job = self._next_due()
+            if job is None:
+                return
+            path, text = job
+            try:
+                with self.perf.measure("write", bytes=len(text)):
+                    atomic_write_text(path, text)
+            except OSError as e:
+                self.write_failed.emit(path, str(e))
+            with self.condition:
+                self.writing = None
+                self.condition.notify_all()
@@ -0,0 +1,267 @@
+import os
+import sys
+import argparse
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from rennips import rennips
+
+from atomic_io import atomic_write_json
+from catalog import IMAGE_EXTENSIONS, index_images
+from image_size import ImageSizeCache
+from label_formats import DOTA_CLASSES, LINT_REPORT_VERSION
+
+
+CHECKS = ("malformed", "out_of_range", "degenerate", "self_intersecting", "non_convex", "unknown_class")
+
+# Labels are written with 6 decimals, so allow that much slack around [0, 1]
+RANGE_TOLERANCE = 1e-6
+# Smallest quad area that is not degenerate, in normalized units and in pixels
+MIN_AREA = 1e-8
+MIN_AREA_PIXELS = 1.0
+# |sin| of the angle between two consecutive edges below which three vertices are collinear
+COLLINEAR_SINE = 1e-6
+
+
+def check_quads(quads, normalized):
+    """
+    Geometry checks of (N, 4, 2) quads in one vectorized pass
+    normalized is an (N,) bool array: True for 0-1 coordinates, False for pixel coordinates
+    (only checked for negative values). Returns check name -> (N,) bool mask; a degenerate
+    quad is not also reported as self-intersecting or non-convex
+    """
+    out_of_range = ((quads < -RANGE_TOLERANCE).any(axis=(1, 2))
+                    | (normalized & (quads > 1 + RANGE_TOLERANCE).any(axis=(1, 2))))
+
+    # The turn (z of the cross product) at every vertex is twice the area of the triangle of
+    # three consecutive vertices; a quarter of their sum is the area of a convex quad, and
+    # unlike the shoelace formula it does not cancel out to 0 for a symmetric bow tie
+    edges = np.roll(quads, -1, axis=1) - quads
+    following = np.roll(edges, -1, axis=1)
+    turns = edges[..., 0] * following[..., 1] - edges[..., 1] * following[..., 0]
+    area = 0.25 * np.abs(turns).sum(axis=1)
+    lengths = np.hypot(edges[..., 0], edges[..., 1])
+    collinear = np.abs(turns) <= COLLINEAR_SINE * lengths * np.roll(lengths, -1, axis=1)
+    degenerate = (area < np.where(normalized, MIN_AREA, MIN_AREA_PIXELS)) | collinear.any(axis=1)
+
+    # A simple convex quad turns the same way at all four vertices; a bow tie turns
+    # twice each way, a concave quad three times one way and once the other
+    left = (turns > 0).sum(axis=1)
+    mixed = ~degenerate & (left > 0) & (left < 4)
+    return {
+        "out_of_range": out_of_range,
+        "degenerate": degenerate,
+        "self_intersecting": mixed & (left == 2),
+        "non_convex": mixed & (left != 2),
+    }
+
+
+def _parse_yolo_line(values, known_classes):
+    """(class id, 8 coordinates, unknown class message or None); raises ValueError if malformed"""
+    if len(values) != 9:
+        raise ValueError(f"expected 9 values (class x1 y1 ... x4 y4), got {len(values)}")
+    class_id = int(values[0])
+    coords = [float(value) for value in values[1:]]
+    unknown = None if class_id in known_classes else f"unknown class {class_id}"
+    return class_id, coords, unknown
+
+
+def _parse_dota_line(values, known_classes):
+    if len(values) != 10:
+        raise ValueError(f"expected 10 values (x1 y1 ... x4 y4 class difficult), got {len(values)}")
+    coords = [float(value) for value in values[:8]]
+    # The converter rejects the whole file on a non-integer difficult flag
+    try:
+        int(values[9])
+    except ValueError:
+        raise ValueError(f"difficult flag must be an integer, got {values[9]!r}") from None
+    class_id = DOTA_CLASSES.get(values[8].replace("-", " "))
+    unknown = None if class_id is not None else f"unknown class {values[8]}"
+    return class_id, coords, unknown
+
+
+def lint_file(label_path, label_format, known_classes, image_size=None):
+    """
+    Parse one label file line by line, keeping every line's problems
+    Returns (issues, coords, lines): line-level issues as (line, check, message) and the
+    (M, 8) coordinates of the parseable objects with their 1-based line numbers.
+    DOTA pixel coordinates are normalized when image_size (width, height) is known
+    """
+    issues = []
+    coords = []
+    lines = []
+    parse = _parse_yolo_line if label_format == "yolo" else _parse_dota_line
+    with open(label_path, 'r', encoding='utf-8', errors='replace') as f:
+        for number, line in enumerate(f, 1):
+            values = line.split()
+            if not values:
+                continue
+            if label_format == "dota" and number <= 2:
+                # The converter drops the first two lines unread (imagesource and gsd)
+                if ":" not in values[0]:
+                    issues.append((number, "malformed", "missing imagesource/gsd header, the converter skips this line"))
+                continue
+            try:
+                _, object_coords, unknown = parse(values, known_classes)
+            except ValueError as e:
+                issues.append((number, "malformed", str(e)))
+                continue
+            if unknown is not None:
+                issues.append((number, "unknown_class", unknown))
+            coords.append(object_coords)
+            lines.append(number)
+
+    coords = np.array(coords, dtype=np.float64).reshape(-1, 8)
+    if label_format == "dota" and image_size is not None:
+        coords = coords / np.array(image_size * 4, dtype=np.float64)
+    return issues, coords, lines
+
+
+# Size cache of the current pool worker, only used for DOTA labels
+_worker_size_cache = None
+
+
+def _init_worker():
+    global _worker_size_cache
+    _worker_size_cache = ImageSizeCache()
+
+
+def _lint_chunk(jobs, label_format, known_classes):
+    """
+    Lint a chunk of (stem, label path, image path or None) jobs
+    The quads of the whole chunk go through check_quads together.
+    Returns (stem -> sorted issues, object count, unreadable files)
+    """
+    if _worker_size_cache is None:
+        _init_worker()
+    issues = {}
+    all_coords = []
+    owners = []
+    line_numbers = []
+    normalized = []
+    unreadable = []
+    for stem, label_path, image_path in jobs:
+        image_size = None
+        if label_format == "dota" and image_path is not None:
+            image_size = _worker_size_cache.get(image_path)
+        try:
+            file_issues, coords, lines = lint_file(label_path, label_format, known_classes, image_size)
+        except OSError as e:
+            unreadable.append((label_path, str(e)))
+            continue
+        if file_issues:
+            issues[stem] = list(file_issues)
+        all_coords.append(coords)
+        owners.extend([stem] * len(lines))
+        line_numbers.extend(lines)
+        normalized.extend([label_format == "yolo" or image_size is not None] * len(lines))
+
+    quads = np.concatenate(all_coords).reshape(-1, 4, 2) if all_coords else np.empty((0, 4, 2))
+    if len(quads):
+        masks = check_quads(quads, np.array(normalized, dtype=bool))
+        for check, mask in masks.items():
+            for j in np.flatnonzero(mask).tolist():
+                message = f"{check.replace('_', ' ')}: " + " ".join(f"{value:.6g}" for value in quads[j].ravel().tolist())
+                issues.setdefault(owners[j], []).append((line_numbers[j], check, message))
+
+    for stem in issues:
+        issues[stem].sort()
+    return issues, len(quads), unreadable
+
+
+def lint_dataset(label_dir, report_path=None, label_format="yolo", known_classes=None, image_dir=None,
+                 workers=1, chunk_size=None, image_extensions=IMAGE_EXTENSIONS, report_limit=20):
+    """
+    Lint every .txt label file of label_dir and write a JSON report
+    YOLO OBB labels (class x1 y1 ... x4 y4, normalized) are checked against known_classes
+    (default: the DOTA class indices); DOTA labels (header, pixel coordinates, class name,
+    difficult) against DOTA_CLASSES. For DOTA, image_dir gives the image sizes needed for the
+    [0, 1] range check; without it only negative coordinates are reported.
+
+    The report lists, per label file stem, the offending lines as {"line", "check", "message"};
+    main.py --lint-report uses it to step through the offending images. Returns the report dict
+    """
+    if known_classes is None:
+        known_classes = set(DOTA_CLASSES.values())
+    known_classes = set(known_classes)
+
+    with os.scandir(label_dir) as entries:
+        label_files = sorted(entry.name for entry in entries if entry.name.endswith('.txt') and entry.is_file())
+    image_index = index_images(image_dir, image_extensions) if label_format == "dota" and image_dir else {}
+    jobs = [(name[:-len('.txt')], os.path.join(label_dir, name), image_index.get(name[:-len('.txt')]))
+            for name in label_files]
+    print(f"Linting {len(jobs)} {label_format} label files...")
+
+    issues = {}
+    objects = 0
+    unreadable = []
+
+    def record(result):
+        nonlocal objects
+        chunk_issues, chunk_objects, chunk_unreadable = result
+        issues.update(chunk_issues)
+        objects += chunk_objects
+        unreadable.extend(chunk_unreadable)
+
+    if chunk_size is None:
+        chunk_size = max(1, min(512, len(jobs) // (workers * 4)))
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            futures = [executor.submit(_lint_chunk, chunk, label_format, known_classes) for chunk in chunks]
+            for future in rennips(as_completed(futures), mode='simple'):
+                record(future.result())
+    else:
+        for chunk in rennips(chunks, mode='simple'):
+            record(_lint_chunk(chunk, label_format, known_classes))
+
+    counts = {check: 0 for check in CHECKS}
+    for file_issues in issues.values():
+        for _, check, _ in file_issues:
+            counts[check] += 1
+    report = {
+        "version": LINT_REPORT_VERSION,
+        "format": label_format,
+        "label_dir": os.path.abspath(label_dir),
+        "files": len(jobs),
+        "objects": objects,
+        "counts": counts,
+        "unreadable": [{"file": path, "error": error} for path, error in sorted(unreadable)],
+        "issues": {stem: [{"line": line, "check": check, "message": message} for line, check, message in issues[stem]]
+                   for stem in sorted(issues)},
+    }
+    if report_path is not None:
+        atomic_write_json(report_path, report)
+
+    print(f"\nLint completed!")
+    print(f"Files: {len(jobs)}, objects: {objects}")
+    print(f"Files with issues: {len(issues)}")
+    for check in CHECKS:
+        if counts[check]:
+            print(f"  {check}: {counts[check]}")
+    for stem in sorted(issues)[:report_limit]:
+        line, check, message = issues[stem][0]
+        more = f" (+{len(issues[stem]) - 1} more)" if len(issues[stem]) > 1 else ""
+        print(f"  {stem}.txt:{line}: {message}{more}")
+    if len(issues) > report_limit:
+        print(f"  ... and {len(issues) - report_limit} more files")
+    for path, error in unreadable:
+        print(f"Error: Could not read {path}: {error}")
+    if report_path is not None:
+        print(f"Report saved to: {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate YOLO OBB or DOTA label files")
+    parser.add_argument("--labels", default="labels/DOTA-v1.5_val_RESULT", help="label directory")
+    parser.add_argument("--format", choices=("yolo", "dota"), default="yolo", help="label format")
+    parser.add_argument("--images", help="image directory, for the range check of DOTA pixel coordinates")
+    parser.add_argument("--num-classes", type=int, help="valid YOLO class ids are 0..N-1 (default: DOTA classes)")
+    parser.add_argument("--report", default="lint_report.json", help="JSON report path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    known_classes = range(args.num_classes) if args.num_classes is not None else None
+    report = lint_dataset(args.labels, args.report, args.format, known_classes, args.images, workers=args.workers)
+    sys.exit(1 if report["issues"] or report["unreadable"] else 0)
@@ -1,11 +1,46 @@
 import os
 import sys
+import json
+import argparse
 import numpy as np
 
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QDesktopWidget, \
-                            QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox
-from PyQt5.QtGui import QPainter, QPen, QImage, QBrush
-from PyQt5.QtCore import Qt, QPoint, QRect, QSettings
+                            QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox, QInputDialog
+from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QFont, QPixmap, QPolygon
+from PyQt5.QtCore import Qt, QPoint, QLine, QRect, QRectF, QSettings, pyqtSignal
+
+from spatial_index import QuadGridIndex
+from image_prefetch import ImagePrefetcher
+from label_writer import LabelWriter
+from polygon_store import PolygonStore
+from tile_cache import TiledImage
+from view_transform import ViewTransform
+from styles import SELECTED_STYLE, DEFAULT_STYLE, CLASS_STYLES, group_by_style, load_class_styles
+from perf import PerfMonitor
+from history import EditHistoryCache, VERTEX, CLASS, DELETE
+from catalog import DatasetCatalog
+from class_index import ClassIndex, IndexFilter
+from label_formats import LINT_REPORT_VERSION
+
+
+def style_pen(style):
+    color, width = style
+    return QPen(QColor(*color), width)
+
+
+def draw_quad_batch(painter, quads, lod_min_size=0):
+    """
+    Draw (N, 4, 2) int32 screen quads with the painter's current pen in two calls:
+    one drawLines for all edges and one drawPoints for quads smaller than lod_min_size
+    """
+    extents = (quads.max(axis=1) - quads.min(axis=1)).max(axis=1)
+    small = extents < lod_min_size
+    if small.any():
+        centers = quads[small].mean(axis=1).astype(np.int32)
+        painter.drawPoints(QPolygon(centers.ravel().tolist()))
+    quads = quads[~small]
+    edges = np.concatenate([quads, np.roll(quads, -1, axis=1)], axis=2).reshape(-1, 4)
+    painter.drawLines([QLine(*edge) for edge in edges.tolist()])
 
 
 class ClassEditDialog(QDialog):
@@ -49,10 +84,34 @@ class DeleteConfirmDialog(QMessageBox):
 
 
 class PolygonViewer(QMainWindow):
-    def __init__(self, label_dir, image_dir):
+    # Emitted from the catalog thread once the whole dataset is enumerated
+    catalog_ready = pyqtSignal()
+    # Emitted from the class index thread once every label file is indexed
+    class_index_ready = pyqtSignal()
+
+    def __init__(self, label_dir, image_dir, class_styles=CLASS_STYLES, default_style=DEFAULT_STYLE,
+                 perf=None, show_perf_hud=False, lint_report=None):
         super().__init__()
-        self.label_files = sorted([f for f in os.listdir(label_dir) if f.endswith('.txt')])
-        self.image_files = sorted([f for f in os.listdir(image_dir) if f.endswith('.png')])
+        # Images and labels are paired by stem; on a cold cache the first pair found is shown
+        # while the rest of the directories is still being enumerated, and the viewer moves
+        # to the first file in stem order once the scan is done (unless the user moved on)
+        self.catalog = DatasetCatalog(image_dir, label_dir, on_complete=lambda catalog: self.catalog_ready.emit())
+        self.catalog_ready.connect(self.on_catalog_ready)
+        self.catalog.start()
+        if not self.catalog.wait_first():
+            raise FileNotFoundError(f"No image/label pairs found in {image_dir} and {label_dir}")
+        self.pairs = self.catalog.pairs
+        
+        # Class -> files index for filtered navigation, built once the catalog is complete
+        self.class_index = None
+        self.nav_filter = None
+        self.filter_classes = None
+        # stem -> issues of a lint_labels.py report; L steps through the offending files
+        self.lint_issues = {}
+        self.lint_filter_on = False
+        self.class_index_ready.connect(self.on_class_index_ready)
+        if self.catalog.complete and self.pairs is self.catalog.pairs:
+            self.start_class_index()
         
         self.current_datetime = None
         self.settings = QSettings("my", "index")
@@ -61,6 +120,8 @@ class PolygonViewer(QMainWindow):
         # else:
         #     self.current_index = 0
         self.current_index = 0
+        # Set by go_to; until then a completed catalog may still switch to the first file
+        self.navigated = False
         self.label_dir = label_dir
         self.image_dir = image_dir
         
@@ -72,67 +133,149 @@ class PolygonViewer(QMainWindow):
         self.zoom_factor = 3
         self.mouse_pos = QPoint()
         
+        # Wheel zoom step and the on-screen size below which polygons are drawn as points
+        self.wheel_zoom_step = 1.25
+        self.lod_min_size = 3
+        
+        # Pen style per class id, see styles.py
+        self.class_styles = class_styles
+        self.default_style = default_style
+        self.pens = {}
+        
+        # Stage timings, shown in the HUD (P key) and optionally logged as JSONL
+        self.perf = perf if perf is not None else PerfMonitor()
+        self.show_perf_hud = show_perf_hud
+        self.hud_rect = QRect(10, 10, 240, 0)
+        
+        # Undo/redo deltas per label file, kept across A/D navigation
+        self.histories = EditHistoryCache()
+        
+        # Screen geometry is needed up front so images can be pre-scaled off the GUI thread
+        screen = QDesktopWidget().screenGeometry()
+        self.screen_width = screen.width()
+        self.screen_height = screen.height()
+        self.label_writer = LabelWriter(perf=self.perf)
+        self.label_writer.write_failed.connect(self.on_write_failed)
+        self.prefetcher = ImagePrefetcher(self.paths_for_index, len(self.pairs),
+                                          self.screen_width, self.screen_height,
+                                          self.parse_polygon_file, perf=self.perf)
+        
         self.load_current_file()
-        print(f"{self.current_index + 1}/{len(self.image_files)} - {self.current_datetime}")
+        print(f"{self.current_index + 1}/{len(self.pairs)} - {self.current_datetime}")
+        if lint_report is not None:
+            self.load_lint_report(lint_report)
         # self.settings.setValue("index", self.current_index)
         self.initUI()
 
+    def paths_for_index(self, index):
+        return self.pairs.paths(index)
+
+    def on_catalog_ready(self):
+        """
+        Switch from the partial pair list to the full one
+        Moves to the first file in stem order (the first lint match with a lint filter), like a
+        warm start opens, unless the user already navigated; then it stays on the current file
+        """
+        if self.pairs is self.catalog.pairs:
+            # The scan finished before the viewer took its snapshot
+            return
+        stem = self.pairs.stems[self.current_index]
+        self.pairs = self.catalog.pairs
+        index = self.pairs.index_of(stem)
+        # Filters and prefetched entries are keyed by index, which just changed meaning;
+        # re-key the filter before anything looks up current_index in it
+        self.nav_filter = self.lint_filter() if self.lint_filter_on else None
+        self.prefetcher.reset(len(self.pairs), None if index is None else (index, self.current_entry))
+        target = index
+        if not self.navigated or index is None:
+            # index is None if the file disappeared while the directory was being scanned
+            target = 0 if self.nav_filter is None or len(self.nav_filter) == 0 else self.nav_filter.next(-1)
+        if target != index:
+            self.current_index = target
+            self.load_current_file()
+            self.update()
+        else:
+            self.current_index = index
+            self.prefetcher.schedule(self.current_index)
+            self.update_title()
+        print(f"Catalog ready: {len(self.pairs)} files")
+        if self.lint_filter_on:
+            print(f"Filter {self.nav_filter.label}: {len(self.nav_filter)} files")
+            if self.nav_filter.rank(self.current_index) is None:
+                self.go_to(self.nav_filter.next(self.current_index))
+        self.start_class_index()
+
+    def start_class_index(self):
+        self.class_index = ClassIndex(self.pairs, on_complete=lambda index: self.class_index_ready.emit()).start()
+
+    def on_class_index_ready(self):
+        if self.filter_classes is not None:
+            self.set_class_filter(self.filter_classes)
+
     def load_current_file(self):
         print(self.current_index)
-        image_path = os.path.join(self.image_dir, self.image_files[self.current_index])
-        # label_path = os.path.join(self.label_dir, self.label_files[self.current_index])
-        self.current_label_path = os.path.join(self.label_dir, self.label_files[self.current_index])
-        
-        self.current_datetime = self.label_files[self.current_index].replace(".txt", "")
-        
-        self.background_image = QImage(image_path)
-        if self.background_image.isNull():
-            raise Exception(f"Failed to load image: {image_path}")
-            
-        self.polygons = self.parse_polygon_file(self.current_label_path)
+        # Make sure edits of the previous file are on disk before moving on
+        self.label_writer.flush()
+        image_path, self.current_label_path = self.paths_for_index(self.current_index)
+        
+        self.current_datetime = self.pairs.stems[self.current_index]
+        
+        # Usually a cache hit thanks to the prefetcher, otherwise decoded right here
+        with self.perf.measure("load", cache_hit=self.current_index in self.prefetcher.cache) as fields:
+            entry = self.prefetcher.load(self.current_index)
+            if entry is None:
+                raise Exception(f"Failed to load image: {image_path}")
+            fields["objects"] = len(entry.store)
+        self.prefetcher.schedule(self.current_index)
+        
+        self.current_entry = entry
+        self.background_image = entry.image
+        self.scaled_image = entry.scaled_image
+        self.drawing_width = self.scaled_image.width()
+        self.drawing_height = self.scaled_image.height()
+        self.view = ViewTransform(self.screen_width, self.screen_height,
+                                  self.drawing_width, self.drawing_height)
+        self.pan_anchor = None
+        self.background_dirty = True
+        self.overlay_dirty = True
+        
+        # The cached entry shares the store, so edits stay visible when coming back to this file
+        self.store = entry.store
+        self.store.set_transform(*self.view.params())
+        self.history = self.histories.get(self.current_label_path)
+        self.spatial_index = QuadGridIndex(self.store.coords)
         self.selected_polygon = None
         self.edit_mode = False
         self.dragging_point = None
         
-        self.setWindowTitle(f'Polygon Viewer - {self.image_files[self.current_index]} ({self.current_index + 1}/{len(self.image_files)})')
+        self.update_title()
+        for issue in self.lint_issues.get(self.current_datetime, ()):
+            print(f"Lint {self.current_datetime}.txt:{issue['line']}: {issue['message']}")
+
+    def update_title(self):
+        image_name = os.path.basename(self.paths_for_index(self.current_index)[0])
+        title = f'Polygon Viewer - {image_name} ({self.current_index + 1}/{len(self.pairs)})'
+        if self.nav_filter is not None:
+            rank = self.nav_filter.rank(self.current_index)
+            title += f' [{self.nav_filter.label}: {rank or "-"}/{len(self.nav_filter)}]'
+        self.setWindowTitle(title)
         
     def get_screen_points(self, polygon_index):
         """Convert normalized coordinates to screen coordinates"""
-        x_offset = (self.screen_width - self.drawing_width) // 2
-        y_offset = (self.screen_height - self.drawing_height) // 2
-        
-        points = []
-        polygon = self.polygons[polygon_index]
-        for j in range(0, 8, 2):
-            x_coord = x_offset + int(polygon[j] * self.drawing_width)
-            y_coord = y_offset + int(polygon[j+1] * self.drawing_height)
-            points.append(QPoint(x_coord, y_coord))
-        return points
+        return [QPoint(x, y) for x, y in self.store.screen_points()[polygon_index].tolist()]
     
     def get_normalized_coordinates(self, screen_x, screen_y):
         """Convert screen coordinates to normalized coordinates"""
-        x_offset = (self.screen_width - self.drawing_width) // 2
-        y_offset = (self.screen_height - self.drawing_height) // 2
-        
-        norm_x = (screen_x - x_offset) / self.drawing_width
-        norm_y = (screen_y - y_offset) / self.drawing_height
-        return norm_x, norm_y
+        return self.view.to_normalized(screen_x, screen_y)
+
+    def on_view_changed(self):
+        """Zoom or pan changed, both cached layers must be redrawn"""
+        self.store.set_transform(*self.view.params())
+        self.background_dirty = True
+        self.invalidate_overlay()
         
     def initUI(self):
-        """Get the current screen geometry"""
-        screen = QDesktopWidget().screenGeometry()
-        self.screen_width = screen.width()
-        self.screen_height = screen.height()
-        
-        self.scaled_image = self.background_image.scaled(
-            self.screen_width, 
-            self.screen_height,
-            Qt.KeepAspectRatio
-        )
-        
-        self.drawing_width = self.scaled_image.width()
-        self.drawing_height = self.scaled_image.height()
-        
+        """Set up the full screen window"""
         self.setGeometry(0, 0, self.screen_width, self.screen_height)
         self.setWindowTitle('Polygon Viewer')
         self.showFullScreen()
@@ -140,46 +283,139 @@ class PolygonViewer(QMainWindow):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         
+    def pen_for_style(self, style):
+        pen = self.pens.get(style)
+        if pen is None:
+            pen = self.pens[style] = style_pen(style)
+        return pen
+
+    def polygon_pen(self, i):
+        if i == self.selected_polygon:
+            return self.pen_for_style(SELECTED_STYLE)
+        return self.pen_for_style(self.class_styles.get(int(self.store.classes[i]), self.default_style))
+
+    def invalidate_overlay(self):
+        """Labels or selection changed, the cached polygon layer must be redrawn"""
+        self.overlay_dirty = True
+        self.update()
+
+    def rebuild_background(self):
+        """Render the visible part of the image into a screen-sized pixmap"""
+        with self.perf.measure("background", zoom=self.view.zoom):
+            self._rebuild_background()
+
+    def _rebuild_background(self):
+        self.background_pixmap = QPixmap(self.screen_width, self.screen_height)
+        self.background_pixmap.fill(Qt.transparent)
+        painter = QPainter(self.background_pixmap)
+        if self.view.is_fitted:
+            painter.drawImage(int(self.view.origin_x), int(self.view.origin_y), self.scaled_image)
+        elif isinstance(self.background_image, TiledImage):
+            self.background_image.draw(painter, QRectF(*self.view.params()),
+                                       QRect(0, 0, self.screen_width, self.screen_height))
+        else:
+            # Only the visible source rectangle of the full resolution image is scaled
+            x0, y0, x1, y1 = self.view.visible_rect()
+            image_width = self.background_image.width()
+            image_height = self.background_image.height()
+            screen_x, screen_y = self.view.to_screen(x0, y0)
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawImage(QRectF(screen_x, screen_y, (x1 - x0) * self.view.width, (y1 - y0) * self.view.height),
+                              self.background_image,
+                              QRectF(x0 * image_width, y0 * image_height,
+                                     (x1 - x0) * image_width, (y1 - y0) * image_height))
+        painter.end()
+        self.background_dirty = False
+
+    def rebuild_overlay(self):
+        """
+        Draw the visible unselected polygons once into a transparent, screen-sized pixmap
+        Polygons outside the viewport are culled through the spatial index, polygons
+        smaller than lod_min_size pixels on screen are drawn as a single point, and every
+        pen style is drawn as one batch
+        """
+        with self.perf.measure("overlay", objects=len(self.store)):
+            self._rebuild_overlay()
+
+    def _rebuild_overlay(self):
+        self.overlay_pixmap = QPixmap(self.screen_width, self.screen_height)
+        self.overlay_pixmap.fill(Qt.transparent)
+        painter = QPainter(self.overlay_pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        
+        visible = self.spatial_index.query_rect(*self.view.visible_rect())
+        visible = visible[visible != self.selected_polygon]
+        classes = self.store.classes[visible]
+        screen_points = self.store.screen_points()[visible]
+        for style, class_ids in group_by_style(np.unique(classes).tolist(), self.class_styles,
+                                               self.default_style):
+            painter.setPen(self.pen_for_style(style))
+            draw_quad_batch(painter, screen_points[np.isin(classes, class_ids)], self.lod_min_size)
+        painter.end()
+        self.overlay_dirty = False
+
+    def selected_polygon_rect(self):
+        """Screen area covered by the selected polygon, its pen and its vertex handles"""
+        rect = QPolygon(self.get_screen_points(self.selected_polygon)).boundingRect()
+        margin = self.point_radius + 4
+        return rect.adjusted(-margin, -margin, margin, margin)
+
     def paintEvent(self, event):
         painter = QPainter(self)
+        with self.perf.measure("paint"):
+            self.paint_scene(painter, event.rect())
+        if self.show_perf_hud:
+            self.draw_perf_hud(painter)
+
+    def paint_scene(self, painter, dirty):
         painter.setRenderHint(QPainter.Antialiasing)
         
-        x = (self.screen_width - self.drawing_width) // 2
-        y = (self.screen_height - self.drawing_height) // 2
+        # Cached layers: visible background and all visible unselected polygons
+        if self.background_dirty:
+            self.rebuild_background()
+        if self.overlay_dirty:
+            self.rebuild_overlay()
+        painter.drawPixmap(dirty, self.background_pixmap, dirty)
+        painter.drawPixmap(dirty, self.overlay_pixmap, dirty)
         
-        painter.drawImage(x, y, self.scaled_image)
-        
-        for i, polygon in enumerate(self.polygons):
-            if i == self.selected_polygon:
-                painter.setPen(QPen(Qt.red, 2))
-            elif self.classes[i] == "9":
-                painter.setPen(QPen(Qt.blue, 1))
-            elif self.classes[i] == "0":
-                painter.setPen(QPen(Qt.yellow, 4))
-            else:
-                painter.setPen(QPen(Qt.green, 1))
-            
-            points = []
-            for j in range(0, 8, 2):
-                # x = int(polygon[j] * self.screen_width)
-                # y = int(polygon[j+1] * self.screen_height)
-                # points.append(QPoint(x, y))
-                x_coord = x + int(polygon[j] * self.drawing_width)
-                y_coord = y + int(polygon[j+1] * self.drawing_height)
-                points.append(QPoint(x_coord, y_coord))
-            
+        # Only the selected polygon is drawn live
+        if self.selected_polygon is not None:
+            points = self.get_screen_points(self.selected_polygon)
+            painter.setPen(self.polygon_pen(self.selected_polygon))
             for j in range(4):
                 painter.drawLine(points[j], points[(j+1)%4])
                 
-            if self.edit_mode and i == self.selected_polygon:
+            if self.edit_mode:
                 painter.setPen(QPen(Qt.red, 2))
                 painter.setBrush(QBrush(Qt.white))
                 for point in points:
                     painter.drawEllipse(point, self.point_radius, self.point_radius)
         
         # if self.edit_mode and self.dragging_point is not None:
-        #     self.draw_magnifier(painter, x, y)
+        #     self.draw_magnifier(painter, self.view.origin_x, self.view.origin_y)
             
+    def draw_perf_hud(self, painter):
+        """Last and p95 time of every measured stage, top left"""
+        lines = self.perf.hud_lines(len(self.store))
+        painter.save()
+        font = QFont("Monospace", 9)
+        font.setStyleHint(QFont.TypeWriter)
+        painter.setFont(font)
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        line_height = painter.fontMetrics().height()
+        self.hud_rect.setHeight(line_height * len(lines) + 10)
+        painter.fillRect(self.hud_rect, QColor(0, 0, 0, 160))
+        painter.setPen(Qt.white)
+        painter.drawText(self.hud_rect.adjusted(5, 5, -5, -5), Qt.AlignLeft | Qt.AlignTop, '\n'.join(lines))
+        painter.restore()
+
+    def toggle_perf_hud(self):
+        self.show_perf_hud = not self.show_perf_hud
+        # Timing stays on without the HUD only when it is being logged
+        self.perf.enabled = self.show_perf_hud or self.perf.log_file is not None
+        print(f"Performance HUD: {'ON' if self.show_perf_hud else 'OFF'}")
+        self.update()
+
     def draw_magnifier(self, painter, img_x, img_y):
         # 마우스 포인터 우측 상단에 돋보기 위치 계산
         mag_x = self.mouse_pos.x() + 20
@@ -215,10 +451,10 @@ class PolygonViewer(QMainWindow):
         
         # 이미지 확대 그리기
         magnified_image = self.background_image.copy(
-            int(source_x * self.background_image.width() / self.drawing_width),
-            int(source_y * self.background_image.height() / self.drawing_height),
-            int(source_size * self.background_image.width() / self.drawing_width),
-            int(source_size * self.background_image.height() / self.drawing_height)
+            int(source_x * self.background_image.width() / self.view.width),
+            int(source_y * self.background_image.height() / self.view.height),
+            int(source_size * self.background_image.width() / self.view.width),
+            int(source_size * self.background_image.height() / self.view.height)
         )
         
         if not magnified_image.isNull():
@@ -259,110 +495,245 @@ class PolygonViewer(QMainWindow):
         painter.drawLine(center_x, center_y - line_length, center_x, center_y + line_length)
                 
     def mousePressEvent(self, event):
-        x_offset = (self.screen_width - self.drawing_width) // 2
-        y_offset = (self.screen_height - self.drawing_height) // 2
+        # Right or middle button drags pan the view
+        if event.button() in (Qt.RightButton, Qt.MiddleButton):
+            self.pan_anchor = event.pos()
+            return
         
-        x = (event.x() - x_offset) / self.drawing_width
-        y = (event.y() - y_offset) / self.drawing_height
+        x, y = self.get_normalized_coordinates(event.x(), event.y())
         
         if self.edit_mode and self.selected_polygon is not None:
             points = self.get_screen_points(self.selected_polygon)
             for i, point in enumerate(points):
                 if (point.x() - event.x()) ** 2 + (point.y() - event.y()) ** 2 <= self.point_radius ** 2:
                     self.dragging_point = i
+                    self.drag_start = self.vertex_position(self.selected_polygon, i)
                     return
                 
-        for i, polygon in enumerate(self.polygons):
-            coords = np.array([(polygon[j], polygon[j+1]) for j in range(0, 8, 2)])
-            if self.point_in_polygon(x, y, coords):
-                self.selected_polygon = i
-                print(f"\nClicked Polygon {i}:")
-                print(f"Coordinates: {self.classes[i]} {polygon[0]:.6f} {polygon[1]:.6f} {polygon[2]:.6f} {polygon[3]:.6f} {polygon[4]:.6f} {polygon[5]:.6f} {polygon[6]:.6f} {polygon[7]:.6f}")
-                self.update()
-                break
+        with self.perf.measure("hit_test", objects=len(self.store)):
+            i = self.spatial_index.hit_test(x, y)
+        if i is not None:
+            polygon = self.store.coords[i]
+            self.selected_polygon = i
+            print(f"\nClicked Polygon {i}:")
+            print(f"Coordinates: {self.store.classes[i]} {polygon[0]:.6f} {polygon[1]:.6f} {polygon[2]:.6f} {polygon[3]:.6f} {polygon[4]:.6f} {polygon[5]:.6f} {polygon[6]:.6f} {polygon[7]:.6f}")
+            self.invalidate_overlay()
             
     def mouseDoubleClickEvent(self, event):
-        x_offset = (self.screen_width - self.drawing_width) // 2
-        y_offset = (self.screen_height - self.drawing_height) // 2
-        
-        x = (event.x() - x_offset) / self.drawing_width
-        y = (event.y() - y_offset) / self.drawing_height
-        
-        for i, polygon in enumerate(self.polygons):
-            coords = np.array([(polygon[j], polygon[j+1]) for j in range(0, 8, 2)])
-            if self.point_in_polygon(x, y, coords):
-                print("Double Clicked!!")
-                self.edit_class(i)
-                break
+        x, y = self.get_normalized_coordinates(event.x(), event.y())
+        
+        i = self.spatial_index.hit_test(x, y)
+        if i is not None:
+            print("Double Clicked!!")
+            self.edit_class(i)
     
     def mouseReleaseEvent(self, event):
+        if event.button() in (Qt.RightButton, Qt.MiddleButton):
+            self.pan_anchor = None
+            return
         if self.dragging_point is not None:
+            # One undo step per drag, from where the vertex was picked up to where it was dropped
+            drag_end = self.vertex_position(self.selected_polygon, self.dragging_point)
+            if drag_end != self.drag_start:
+                self.history.record((VERTEX, self.selected_polygon, self.dragging_point, self.drag_start, drag_end))
             self.dragging_point = None
             self.save_changes()
             
     def mouseMoveEvent(self, event):
         self.mouse_pos = event.pos()
+        if self.pan_anchor is not None:
+            delta = event.pos() - self.pan_anchor
+            self.pan_anchor = event.pos()
+            self.view.pan(delta.x(), delta.y())
+            self.on_view_changed()
+            return
         if self.edit_mode and self.dragging_point is not None:
             norm_x, norm_y = self.get_normalized_coordinates(event.x(), event.y())
             norm_x = max(0, min(1, norm_x))
             norm_y = max(0, min(1, norm_y))
             
-            self.polygons[self.selected_polygon][self.dragging_point * 2] = norm_x
-            self.polygons[self.selected_polygon][self.dragging_point * 2 + 1] = norm_y
-            self.update()
+            old_rect = self.selected_polygon_rect()
+            self.store.set_vertex(self.selected_polygon, self.dragging_point, norm_x, norm_y)
+            self.spatial_index.update(self.selected_polygon, self.store.coords[self.selected_polygon])
+            # Repaint only where the dragged polygon was and is now
+            self.update(old_rect.united(self.selected_polygon_rect()))
+            if self.show_perf_hud:
+                self.update(self.hud_rect)
             
     def edit_class(self, polygon_index):
-        dialog = ClassEditDialog(self.classes[polygon_index], self)
+        dialog = ClassEditDialog(str(self.store.classes[polygon_index]), self)
         if dialog.exec_() == QDialog.Accepted:
             new_class = dialog.class_input.text()
-            if new_class.isdigit():  # Ensure input is a valid number
-                self.classes[polygon_index] = new_class
+            # Ensure input is a valid number that fits the int16 class array
+            if new_class.isdigit() and int(new_class) <= np.iinfo(np.int16).max:
+                old_class = int(self.store.classes[polygon_index])
+                if old_class != int(new_class):
+                    self.history.record((CLASS, polygon_index, old_class, int(new_class)))
+                self.store.set_class(polygon_index, int(new_class))
                 self.save_changes()
+                self.invalidate_overlay()
                 print(f"Changed polygon {polygon_index} class to {new_class}")
     
     def save_changes(self):
         """Save the updated classes to the label file"""
-        lines = []
-        for cls, polygon in zip(self.classes, self.polygons):
-            coords = ' '.join([f'{x:.6f}' for x in polygon])
-            lines.append(f'{cls} {coords}')
-        
-        with open(self.current_label_path, 'w') as f:
-            f.write('\n'.join(lines))
+        # Written atomically on the writer thread, rapid saves of this file are merged
+        with self.perf.measure("save", objects=len(self.store)):
+            self.label_writer.save(self.current_label_path, self.store.to_text())
         print("Saved polygon.")
+        # Keep the class index current; a class filter only changes if the file's class set did
+        if self.class_index is not None:
+            stem = self.pairs.stems[self.current_index]
+            if self.class_index.update(stem, self.store.classes) and self.filter_classes is not None:
+                self.set_class_filter(self.filter_classes)
+
+    def on_write_failed(self, path, error):
+        print(f"Error: Failed to save {path}: {error}")
+        QMessageBox.critical(self, 'Save Failed', f'Could not save {os.path.basename(path)}:\n{error}')
         
     def delete_selected_polygon(self):
         if self.selected_polygon is not None:
             dialog = DeleteConfirmDialog(self)
             if dialog.exec_() == QMessageBox.Yes:
                 print(f"Deleting polygon {self.selected_polygon}")
-                del self.polygons[self.selected_polygon]
-                del self.classes[self.selected_polygon]
+                self.history.record((DELETE, self.selected_polygon,
+                                     tuple(self.store.coords[self.selected_polygon].tolist()),
+                                     int(self.store.classes[self.selected_polygon])))
+                self.store.delete(self.selected_polygon)
+                self.spatial_index.remove(self.selected_polygon)
                 self.save_changes()
                 self.selected_polygon = None
                 self.edit_mode = False
-                self.update()
+                self.invalidate_overlay()
     
-    def point_in_polygon(self, x, y, polygon):
-        n = len(polygon)
-        inside = False
-        p1x, p1y = polygon[0]
-        for i in range(n + 1):
-            p2x, p2y = polygon[i % n]
-            if y > min(p1y, p2y):
-                if y <= max(p1y, p2y):
-                    if x <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or x <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-        return inside
+    def vertex_position(self, polygon_index, vertex):
+        return tuple(self.store.coords[polygon_index, vertex * 2:vertex * 2 + 2].tolist())
+
+    def undo_edit(self, redo=False):
+        """Revert (or re-apply) the last edit of this file and save the result"""
+        result = self.history.redo(self.store) if redo else self.history.undo(self.store)
+        if result is None:
+            print(f"Nothing to {'redo' if redo else 'undo'}")
+            return
+        op, i, exists = result
+        # Keep the spatial index in step with the store
+        if op[0] == VERTEX:
+            self.spatial_index.update(i, self.store.coords[i])
+        elif op[0] == DELETE:
+            if exists:
+                self.spatial_index.insert(i, self.store.coords[i])
+            else:
+                self.spatial_index.remove(i)
+        print(f"{'Redo' if redo else 'Undo'}: {op[0]} of polygon {i}")
+        
+        self.selected_polygon = i if exists else None
+        self.dragging_point = None
+        if not exists:
+            self.edit_mode = False
+        self.save_changes()
+        self.invalidate_overlay()
+
+    def set_class_filter(self, class_ids):
+        """Make A/D visit only files containing one of class_ids; None or empty shows all files"""
+        self.lint_filter_on = False
+        if not class_ids:
+            self.nav_filter = self.filter_classes = None
+            print("Filter cleared")
+        else:
+            self.filter_classes = class_ids
+            self.nav_filter = self.class_index.filter(class_ids)
+            if not self.class_index.complete:
+                print(f"Class index is still being built ({self.class_index.built}/{len(self.pairs)} files), the filter is refreshed when it is done")
+            print(f"Filter {self.nav_filter.label}: {len(self.nav_filter)} files")
+        self.update_title()
+
+    def ask_class_filter(self):
+        if self.class_index is None:
+            print("Class index is not available until the dataset catalog is complete")
+            return
+        current = ",".join(str(class_id) for class_id in self.filter_classes or ())
+        text, ok = QInputDialog.getText(self, 'Class Filter', 'Visit only files with these classes (e.g. 0,9), empty for all:', text=current)
+        if not ok:
+            return
+        tokens = text.replace(",", " ").split()
+        if not all(token.isdigit() for token in tokens):
+            print(f"Invalid class filter: {text}")
+            return
+        self.set_class_filter(sorted({int(token) for token in tokens}))
+        # Move to the first match if the current file is not one
+        if self.nav_filter is not None and self.nav_filter.rank(self.current_index) is None:
+            self.go_to(self.nav_filter.next(self.current_index))
+
+    def load_lint_report(self, path):
+        """Read a lint_labels.py report and restrict A/D to the files it lists"""
+        with open(path, 'r') as f:
+            report = json.load(f)
+        if report.get("version") != LINT_REPORT_VERSION:
+            print(f"Warning: Unsupported lint report {path}")
+            return
+        self.lint_issues = report["issues"]
+        print(f"Lint report: {len(self.lint_issues)} files with issues")
+        self.set_lint_filter(True)
+
+    def set_lint_filter(self, enabled):
+        """Make A/D visit only the files of the lint report, or drop that filter again"""
+        if not enabled:
+            self.set_class_filter(None)
+            return
+        self.filter_classes = None
+        self.nav_filter = self.lint_filter()
+        self.lint_filter_on = True
+        print(f"Filter {self.nav_filter.label}: {len(self.nav_filter)} files")
+        self.update_title()
+        if self.nav_filter.rank(self.current_index) is None:
+            self.go_to(self.nav_filter.next(self.current_index))
+
+    def lint_filter(self):
+        """IndexFilter over the dataset indices of the files listed in the lint report"""
+        matches = [self.pairs.index_of(stem) for stem in self.lint_issues]
+        return IndexFilter([i for i in matches if i is not None], len(self.pairs), "lint")
+
+    def toggle_lint_filter(self):
+        if not self.lint_issues:
+            print("No lint report loaded (--lint-report)")
+            return
+        self.set_lint_filter(not self.lint_filter_on)
+
+    def step(self, direction):
+        """Next (1) or previous (-1) file, through the active filter if there is one"""
+        if self.nav_filter is None:
+            self.go_to((self.current_index + direction) % len(self.pairs))
+        elif len(self.nav_filter) == 0:
+            print(f"No files match {self.nav_filter.label}")
+        elif direction > 0:
+            self.go_to(self.nav_filter.next(self.current_index))
+        else:
+            self.go_to(self.nav_filter.previous(self.current_index))
+
+    def go_to(self, index):
+        if index is None:
+            return
+        self.current_index = index
+        self.navigated = True
+        print(f"{self.current_index + 1}/{len(self.pairs)} - {self.current_datetime}")
+        self.settings.setValue("index", self.current_index)
+        self.load_current_file()
+        self.update()
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        if steps:
+            self.view.zoom_at(event.x(), event.y(), self.wheel_zoom_step ** steps)
+            self.on_view_changed()
     
     def keyPressEvent(self, e):
         if e.modifiers() & Qt.ControlModifier:
             if e.key() == Qt.Key_W:
                 self.close()
+            elif e.key() == Qt.Key_Z:
+                # Ctrl+Shift+Z redoes as well
+                self.undo_edit(redo=bool(e.modifiers() & Qt.ShiftModifier))
+            elif e.key() == Qt.Key_Y:
+                self.undo_edit(redo=True)
         elif e.key() == Qt.Key_Q:
             self.close()
         elif e.key() == Qt.Key_Delete:
@@ -373,40 +744,52 @@ class PolygonViewer(QMainWindow):
                 self.edit_mode = not self.edit_mode
                 print(f"Edit mode: {'ON' if self.edit_mode else 'OFF'}")
                 self.update()
+        elif e.key() == Qt.Key_P:
+            self.toggle_perf_hud()
+        elif e.key() == Qt.Key_R:
+            # Back to the whole image fitted to the screen
+            self.view.reset()
+            self.on_view_changed()
+        elif e.key() == Qt.Key_F:
+            self.ask_class_filter()
+        elif e.key() == Qt.Key_L:
+            self.toggle_lint_filter()
         elif e.key() == Qt.Key_A:
-            self.current_index = (self.current_index - 1) % len(self.image_files)
-            print(f"{self.current_index + 1}/{len(self.image_files)} - {self.current_datetime}")
-            self.settings.setValue("index", self.current_index)
-            self.load_current_file()
-            self.initUI()
-            self.update()
+            self.step(-1)
         elif e.key() == Qt.Key_D:
-            self.current_index = (self.current_index + 1) % len(self.image_files)
-            print(f"{self.current_index + 1}/{len(self.image_files)} - {self.current_datetime}")
-            self.settings.setValue("index", self.current_index)
-            self.load_current_file()
-            self.initUI()
-            self.update()
+            self.step(1)
+
+    @staticmethod
+    def parse_polygon_file(filename):
+        """Parse a YOLO OBB label file in bulk into a PolygonStore; also runs on prefetch threads"""
+        return PolygonStore.from_file(filename)
 
-    def parse_polygon_file(self, filename):
-        polygons = []
-        self.classes = []
-        with open(filename, 'r') as file:
-            for line in file:
-                values = line.split()
-                if len(values) == 9:  # class + 8 coordinates
-                    polygons.append([float(x) for x in values[1:]])  # Skip the class
-                    self.classes.append(values[0])
-        return polygons
+    def closeEvent(self, event):
+        self.label_writer.close()
+        self.prefetcher.shutdown()
+        self.perf.close()
+        super().closeEvent(event)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Oriented bounding box label viewer")
+    parser.add_argument("--labels", default="labels/DOTA-v1.5_val_RESULT", help="label directory")
+    parser.add_argument("--images", default="images", help="image directory")
+    parser.add_argument("--styles", help="JSON class style table, see styles.py")
+    parser.add_argument("--perf", action="store_true", help="show the performance HUD from the start (toggle with P)")
+    parser.add_argument("--perf-log", help="append per-event timings to this JSONL file")
+    parser.add_argument("--lint-report", help="lint_labels.py JSON report; A/D visit only the listed files (toggle with L)")
+    args = parser.parse_args()
+
     try:
-        label_dir = "labels/DOTA-v1.5_val_RESULT"
-        image_dir = "images"
-        
-        app = QApplication(sys.argv)
-        viewer = PolygonViewer(label_dir, image_dir)
+        label_dir = args.labels
+        image_dir = args.images
+        class_styles, default_style = load_class_styles(args.styles) if args.styles else (CLASS_STYLES, DEFAULT_STYLE)
+        perf = PerfMonitor(enabled=args.perf or args.perf_log is not None, log_path=args.perf_log)
+        
+        app = QApplication(sys.argv[:1])
+        viewer = PolygonViewer(label_dir, image_dir, class_styles, default_style, perf, show_perf_hud=args.perf,
+                               lint_report=args.lint_report)
         viewer.show()
         sys.exit(app.exec_())
         
@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import numpy as np
+
+from collections import deque
+from contextlib import contextmanager
+
+
+class PerfMonitor:
+    """
+    Lightweight stage timer for the viewer
+    Keeps the last `window` durations per stage for the HUD (last and p95) and, when
+    log_path is set, appends one JSON line per measurement. Safe to use from worker
+    threads. While disabled, measure() only costs a flag check.
+    """
+    def __init__(self, enabled=False, log_path=None, window=200):
+        self.enabled = enabled
+        self.window = window
+        self.session = uuid.uuid4().hex[:12]
+        self.samples = {}  # stage -> deque of milliseconds
+        self.lock = threading.Lock()
+        self.log_file = None
+        if log_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            self.log_file = open(log_path, 'a', encoding='utf-8')
+
+    @contextmanager
+    def measure(self, stage, **fields):
+        """Time the body of a with block as `stage`; extra fields go to the log line"""
+        if not self.enabled:
+            yield fields
+            return
+        start = time.perf_counter()
+        try:
+            # The caller may add fields (e.g. object counts) that are only known inside the block
+            yield fields
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000, **fields)
+
+    def record(self, stage, ms, **fields):
+        if not self.enabled:
+            return
+        with self.lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = deque(maxlen=self.window)
+            samples.append(ms)
+            if self.log_file is not None:
+                line = {"ts": time.time(), "session": self.session, "stage": stage, "ms": round(ms, 3)}
+                line.update(fields)
+                self.log_file.write(json.dumps(line) + "\n")
+
+    def summary(self):
+        """[(stage, last ms, p95 ms)] over the rolling window, in first-seen order"""
+        with self.lock:
+            stages = [(stage, list(samples)) for stage, samples in self.samples.items()]
+        return [(stage, samples[-1], float(np.percentile(samples, 95))) for stage, samples in stages]
+
+    def hud_lines(self, object_count):
+        lines = [f"{'stage':<10}{'last':>9}{'p95':>9}"]
+        for stage, last, p95 in self.summary():
+            lines.append(f"{stage:<10}{last:>7.1f}ms{p95:>7.1f}ms")
+        lines.append(f"objects   {object_count:>9}")
+        return lines
+
+    def close(self):
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
+
+
+# Shared disabled monitor for code paths that were not given one
+NO_PERF = PerfMonitor()
+
+
+def summarize_logs(paths):
+    """Aggregate per-stage timings of one or more JSONL logs: {stage: (count, mean, p50, p95, max)}"""
+    samples = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A crashed session can leave a truncated last line
+                    continue
+                samples.setdefault(event["stage"], []).append(event["ms"])
+    return {stage: (len(ms), float(np.mean(ms)), float(np.percentile(ms, 50)),
+                    float(np.percentile(ms, 95)), float(np.max(ms)))
+            for stage, ms in samples.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Aggregate viewer performance logs")
+    parser.add_argument("logs", nargs='+', help="JSONL files written with main.py --perf-log")
+    args = parser.parse_args()
+
+    stats = summarize_logs(args.logs)
+    if not stats:
+        print("No measurements found.")
+        sys.exit(1)
+    print(f"{'stage':<12}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for stage, (count, mean, p50, p95, maximum) in sorted(stats.items()):
+        print(f"{stage:<12}{count:>8}{mean:>10.1f}{p50:>10.1f}{p95:>10.1f}{maximum:>10.1f}")
@@ -0,0 +1,168 @@
+import numpy as np
+
+
+class PointIndex:
+    """
+    Grid hash over the annotated objects of one image (each object is a list of [x, y] points)
+    Points and the segments between consecutive points of an object are bucketed into square
+    cells of cell_size pixels, so a query only measures the distance to what is registered in
+    the cells around the click, in one vectorized step.
+    """
+    def __init__(self, objects=(), cell_size=16):
+        self.cell_size = cell_size
+        self.objects = []
+        self.rebuild(objects)
+
+    def rebuild(self, objects):
+        # Point and segment ids are rows of the arrays below and never change until the next
+        # rebuild; removed objects leave dead rows (owner -1) that no cell refers to anymore.
+        # Owners are stable object uids, uids holds the uid of every live object in list order.
+        self.objects = []
+        self.uids = np.empty(0, dtype=np.int64)
+        self.point_start = []  # uid -> id of its first point
+        self.segment_start = []  # uid -> id of its first segment
+        self.points = np.empty((0, 2), dtype=np.float64)
+        self.point_owner = np.empty(0, dtype=np.int64)
+        self.segments = np.empty((0, 4), dtype=np.float64)
+        self.segment_owner = np.empty(0, dtype=np.int64)
+        self.point_cells = {}
+        self.segment_cells = {}
+        self.dead = 0
+        self._append(objects)
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def _segment_cells(self, x0, y0, x1, y1):
+        cx0, cy0 = self._cell(min(x0, x1), min(y0, y1))
+        cx1, cy1 = self._cell(max(x0, x1), max(y0, y1))
+        return [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+
+    def _append(self, objects):
+        """Register objects after the current ones, bucketing only their own points and segments"""
+        points, point_owner, segments, segment_owner = [], [], [], []
+        first_uid = len(self.point_start)
+        for object_points in objects:
+            object_points = [list(point) for point in object_points]
+            uid = len(self.point_start)
+            self.objects.append(object_points)
+            self.point_start.append(len(self.points) + len(points))
+            self.segment_start.append(len(self.segments) + len(segments))
+            points.extend(object_points)
+            point_owner.extend([uid] * len(object_points))
+            for start, end in zip(object_points, object_points[1:]):
+                segments.append(start + end)
+                segment_owner.append(uid)
+        self.uids = np.concatenate([self.uids, np.arange(first_uid, len(self.point_start), dtype=np.int64)])
+
+        if points:
+            first = len(self.points)
+            new_points = np.array(points, dtype=np.float64).reshape(-1, 2)
+            self.points = np.concatenate([self.points, new_points])
+            self.point_owner = np.concatenate([self.point_owner, np.array(point_owner, dtype=np.int64)])
+            for j, (x, y) in enumerate(new_points.tolist(), first):
+                self.point_cells.setdefault(self._cell(x, y), []).append(j)
+        if segments:
+            first = len(self.segments)
+            new_segments = np.array(segments, dtype=np.float64).reshape(-1, 4)
+            self.segments = np.concatenate([self.segments, new_segments])
+            self.segment_owner = np.concatenate([self.segment_owner, np.array(segment_owner, dtype=np.int64)])
+            for j, segment in enumerate(new_segments.tolist(), first):
+                for cell in self._segment_cells(*segment):
+                    self.segment_cells.setdefault(cell, []).append(j)
+
+    def _nearby(self, cells, x, y, radius):
+        """Ids registered in the cells within radius of (x, y)"""
+        cx0, cy0 = self._cell(x - radius, y - radius)
+        cx1, cy1 = self._cell(x + radius, y + radius)
+        ids = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                ids.update(cells.get((cx, cy), ()))
+        return np.fromiter(ids, dtype=np.int64, count=len(ids))
+
+    def add(self, object_points):
+        """Register a new object appended to the object list"""
+        self._append([object_points])
+
+    def remove(self, object_index):
+        """Drop an object; later objects shift down by one like the object list does"""
+        uid = int(self.uids[object_index])
+        count = len(self.objects[object_index])
+        del self.objects[object_index]
+        self.uids = np.delete(self.uids, object_index)
+
+        first = self.point_start[uid]
+        for j, (x, y) in enumerate(self.points[first:first + count].tolist(), first):
+            self._unregister(self.point_cells, self._cell(x, y), j)
+        self.point_owner[first:first + count] = -1
+        first = self.segment_start[uid]
+        for j, segment in enumerate(self.segments[first:first + max(count - 1, 0)].tolist(), first):
+            for cell in self._segment_cells(*segment):
+                self._unregister(self.segment_cells, cell, j)
+        self.segment_owner[first:first + max(count - 1, 0)] = -1
+
+        # Compact once dead rows outnumber the live ones
+        self.dead += count
+        if self.dead > len(self.points) - self.dead:
+            self.rebuild(self.objects)
+
+    @staticmethod
+    def _unregister(cells, cell, j):
+        ids = cells[cell]
+        ids.remove(j)
+        if not ids:
+            del cells[cell]
+
+    def _locate(self, owner, j, starts):
+        """(object index, index within the object) of row j owned by uid owner"""
+        return int(np.searchsorted(self.uids, owner)), int(j) - starts[owner]
+
+    def nearest_point(self, x, y, max_distance):
+        """(object index, point index in the object, distance) of the closest point, or None"""
+        ids = self._nearby(self.point_cells, x, y, max_distance)
+        if len(ids) == 0:
+            return None
+        distances = np.hypot(self.points[ids, 0] - x, self.points[ids, 1] - y)
+        best = int(np.argmin(distances))
+        if distances[best] > max_distance:
+            return None
+        j = ids[best]
+        return (*self._locate(int(self.point_owner[j]), j, self.point_start), float(distances[best]))
+
+    def nearest_segment(self, x, y, max_distance):
+        """(object index, segment index in the object, distance) of the closest segment, or None"""
+        ids = self._nearby(self.segment_cells, x, y, max_distance)
+        if len(ids) == 0:
+            return None
+        x0, y0, x1, y1 = self.segments[ids].T
+        dx, dy = x1 - x0, y1 - y0
+        length2 = dx * dx + dy * dy
+        # Projection of the click onto each segment, clamped to its end points
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(length2 > 1e-12, ((x - x0) * dx + (y - y0) * dy) / length2, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        distances = np.hypot(x0 + t * dx - x, y0 + t * dy - y)
+        best = int(np.argmin(distances))
+        if distances[best] > max_distance:
+            return None
+        j = ids[best]
+        return (*self._locate(int(self.segment_owner[j]), j, self.segment_start), float(distances[best]))
+
+    def nearest(self, x, y, max_distance):
+        """
+        The single closest hit, a point or a segment, within max_distance
+        Returns (object index, "point" or "segment", index in the object, distance) or None
+        """
+        hits = []
+        point = self.nearest_point(x, y, max_distance)
+        if point is not None:
+            hits.append((point[2], 0, point[0], "point", point[1]))
+        segment = self.nearest_segment(x, y, max_distance)
+        if segment is not None:
+            hits.append((segment[2], 1, segment[0], "segment", segment[1]))
+        if not hits:
+            return None
+        # Points win ties, since a point lies on its own segments
+        distance, _, owner, kind, index = min(hits)
+        return owner, kind, index, distance
@@ -0,0 +1,74 @@
+import numpy as np
+
+from yolo_labels import read_yolo_obb_labels, format_yolo_obb_lines
+
+
+class PolygonStore:
+    """
+    Polygons of one label file: (N, 8) float32 normalized quads and (N,) int16 classes
+    Screen coordinates of all quads are cached and recomputed in one vectorized step
+    whenever the screen transform changes
+    """
+    def __init__(self, coords=None, classes=None):
+        if coords is None:
+            coords = np.empty((0, 8), dtype=np.float32)
+            classes = np.empty(0, dtype=np.int16)
+        self.coords = np.ascontiguousarray(coords, dtype=np.float32).reshape(-1, 8)
+        self.classes = np.ascontiguousarray(classes, dtype=np.int16)
+        self.transform = None
+        self._screen = None
+
+    @classmethod
+    def from_file(cls, filename):
+        classes, coords = read_yolo_obb_labels(filename)
+        return cls(coords, classes)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def to_text(self):
+        """Label file contents in YOLO OBB format"""
+        return '\n'.join(format_yolo_obb_lines(self.classes, self.coords.astype(np.float64)))
+
+    def set_transform(self, x_offset, y_offset, width, height):
+        """Screen position and size of the drawn image; screen points are recomputed on change"""
+        transform = (x_offset, y_offset, width, height)
+        if transform != self.transform:
+            self.transform = transform
+            self._screen = None
+
+    def _to_screen(self, coords):
+        x_offset, y_offset, width, height = self.transform
+        screen = np.empty(coords.shape[:-1] + (4, 2), dtype=np.int32)
+        # astype truncates toward zero, same as the int() the viewer always used
+        screen[..., 0] = x_offset + (coords[..., 0::2].astype(np.float64) * width).astype(np.int32)
+        screen[..., 1] = y_offset + (coords[..., 1::2].astype(np.float64) * height).astype(np.int32)
+        return screen
+
+    def screen_points(self):
+        """(N, 4, 2) int32 screen coordinates of every quad"""
+        if self._screen is None:
+            self._screen = self._to_screen(self.coords)
+        return self._screen
+
+    def set_vertex(self, i, vertex, x, y):
+        self.coords[i, vertex * 2] = x
+        self.coords[i, vertex * 2 + 1] = y
+        if self._screen is not None:
+            self._screen[i] = self._to_screen(self.coords[i])
+
+    def set_class(self, i, class_id):
+        self.classes[i] = class_id
+
+    def delete(self, i):
+        self.coords = np.delete(self.coords, i, axis=0)
+        self.classes = np.delete(self.classes, i)
+        if self._screen is not None:
+            self._screen = np.delete(self._screen, i, axis=0)
+
+    def insert(self, i, coords, class_id):
+        """Put a polygon back at index i, the inverse of delete"""
+        self.coords = np.insert(self.coords, i, coords, axis=0)
+        self.classes = np.insert(self.classes, i, class_id)
+        if self._screen is not None:
+            self._screen = np.insert(self._screen, i, self._to_screen(self.coords[i]), axis=0)
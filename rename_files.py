@@ -1,58 +1,218 @@
 import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import threading
 
-def rename_merge_files(root_path):
-    # Walk through all directories
-    for dirpath, dirnames, filenames in os.walk(root_path):
-        # Filter for files ending with _merge.txt
-        merge_files = [f for f in filenames if f.endswith('_merge.txt')]
-        
-        for file in merge_files:
-            # Create old and new file paths
-            old_file_path = os.path.join(dirpath, file)
-            new_file_name = f"{file}".replace('_merge.txt', '.txt')
-            fname = new_file_name.split('_')
-            new_file_name = f"{fname[0]}_{fname[2]}"
-            # continue
-            new_file_path = os.path.join(dirpath, new_file_name)
-            
-            # Rename the file
-            try:
-                # os.rename(old_file_path, new_file_path)
-                print(f"Renamed: {file} -> {new_file_name}")
-            except Exception as e:
-                print(f"Error renaming {file}: {str(e)}")
+from concurrent.futures import ThreadPoolExecutor
 
-# root_path = "./"
-# rename_merge_files(root_path)
 
+# Linux FICLONE ioctl: copy-on-write clone of a whole file (btrfs, xfs, ...)
+FICLONE = 0x40049409
+TRANSFER_MODES = ("hardlink", "reflink", "rename", "copy")
 
 
-import os
-import shutil
+def plan_merge_renames(root_path):
+    """
+    (old path, new path) of every *_merge.txt file under root_path
+    <a>_<b>_<c>_merge.txt becomes <a>_<c>.txt in the same directory
+    """
+    plan = []
+    for dirpath, dirnames, filenames in os.walk(root_path):
+        # Filter for files ending with _merge.txt
+        for file in sorted(f for f in filenames if f.endswith('_merge.txt')):
+            new_file_name = file.replace('_merge.txt', '.txt')
+            fname = new_file_name.split('_')
+            if len(fname) < 3:
+                print(f"Error renaming {file}: expected at least 3 '_' separated parts")
+                continue
+            plan.append((os.path.join(dirpath, file), os.path.join(dirpath, f"{fname[0]}_{fname[2]}")))
+    return plan
+
 
-def move_prefixed_files(root_path, destination_path):
-    # Create destination directory if it doesn't exist
-    os.makedirs(destination_path, exist_ok=True)
-    
-    # Walk through all directories
+def plan_prefixed_moves(root_path, destination_path):
+    """(source, destination) of every file under root_path whose name starts with its folder name"""
+    destination = os.path.abspath(destination_path)
+    plan = []
     for dirpath, dirnames, filenames in os.walk(root_path):
+        # Never collect from the destination itself
+        dirnames[:] = sorted(d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) != destination)
+        # As before, a root given with a trailing separator ("./") has an empty folder name,
+        # so every file directly under it is collected
         parent_folder = os.path.basename(dirpath)
-        
-        # Filter for files that start with the parent folder name
-        for file in filenames:
+        for file in sorted(filenames):
             if file.startswith(parent_folder):
-                # Create full paths
-                source_file = os.path.join(dirpath, file)
-                destination_file = os.path.join(destination_path, file)
-                
-                try:
-                    # Move the file
-                    shutil.copy(source_file, destination_file)
-                    print(f"Moved: {file} -> {destination_path}")
-                except Exception as e:
-                    print(f"Error moving {file}: {str(e)}")
-
-root_path = "./"
-destination_path = "labels"
-
-move_prefixed_files(root_path, destination_path)
\ No newline at end of file
+                plan.append((os.path.join(dirpath, file), os.path.join(destination_path, file)))
+    return plan
+
+
+def check_plan(plan):
+    """
+    Collisions of a plan, checked before anything is touched
+    Returns a list of messages: several sources for one destination, or a destination
+    that already exists (operations run in parallel, so chains like a -> b, b -> c are refused too)
+    """
+    problems = []
+    targets = {}
+    for src, dst in plan:
+        targets.setdefault(os.path.abspath(dst), []).append(src)
+    for dst, srcs in targets.items():
+        if len(srcs) > 1:
+            problems.append(f"{len(srcs)} files map to {dst}: {', '.join(srcs)}")
+        elif os.path.lexists(dst):
+            problems.append(f"Destination already exists: {dst} (from {srcs[0]})")
+    return problems
+
+
+def reflink(src, dst):
+    """Copy-on-write clone of src; raises OSError where the filesystem or OS has no support"""
+    import fcntl
+
+    with open(src, 'rb') as fsrc, open(dst, 'xb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+
+
+def transfer(src, dst, mode):
+    if mode == "hardlink":
+        os.link(src, dst)
+    elif mode == "reflink":
+        reflink(src, dst)
+    elif mode == "rename":
+        os.rename(src, dst)
+    elif mode == "copy":
+        shutil.copy2(src, dst)
+    else:
+        raise ValueError(f"Unknown transfer mode: {mode}")
+
+
+def execute_plan(plan, mode="copy", workers=8, journal_path=None, dry_run=False):
+    """
+    Run a checked plan on a thread pool
+    Every finished operation is appended to the JSONL journal right away, so a run (even an
+    interrupted one) can be undone with rollback(journal_path). Returns (done, failed)
+    """
+    if dry_run:
+        for src, dst in plan:
+            print(f"{mode}: {src} -> {dst}")
+        return 0, 0
+
+    for directory in {os.path.dirname(dst) for _, dst in plan}:
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    lock = threading.Lock()
+    journal = open(journal_path, 'a', encoding='utf-8') if journal_path else None
+    done = 0
+    failed = 0
+
+    def run(step):
+        nonlocal done, failed
+        src, dst = step
+        try:
+            transfer(src, dst, mode)
+        except OSError as e:
+            with lock:
+                failed += 1
+            print(f"Error: {mode} {src} -> {dst}: {str(e)}")
+            return
+        with lock:
+            done += 1
+            if journal is not None:
+                journal.write(json.dumps({"mode": mode, "src": src, "dst": dst}) + "\n")
+                journal.flush()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # list() re-raises anything unexpected from the workers
+            list(executor.map(run, plan))
+    finally:
+        if journal is not None:
+            journal.close()
+    return done, failed
+
+
+def rollback(journal_path):
+    """Undo the operations of a journal in reverse order; returns (undone, failed)"""
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    undone = 0
+    failed = 0
+    for entry in reversed(entries):
+        try:
+            if entry["mode"] == "rename":
+                if os.path.lexists(entry["src"]):
+                    raise OSError(f"{entry['src']} exists again")
+                os.rename(entry["dst"], entry["src"])
+            else:
+                os.remove(entry["dst"])
+            undone += 1
+        except OSError as e:
+            failed += 1
+            print(f"Error: Cannot undo {entry['mode']} {entry['src']} -> {entry['dst']}: {str(e)}")
+    return undone, failed
+
+
+def run_plan(plan, mode, workers, journal_path, dry_run):
+    """Check a plan, stop on collisions, then execute it and print a summary"""
+    print(f"Planned {len(plan)} operations ({mode})")
+    problems = check_plan(plan)
+    if problems:
+        for problem in problems:
+            print(f"Conflict: {problem}")
+        print(f"\n{len(problems)} conflicts, nothing was changed")
+        return False
+    done, failed = execute_plan(plan, mode, workers, journal_path, dry_run)
+    if not dry_run:
+        print(f"\nDone: {done}, failed: {failed}")
+        if journal_path is not None:
+            print(f"Journal: {journal_path} (undo with: python rename_files.py rollback {journal_path})")
+    return failed == 0
+
+
+def rename_merge_files(root_path, dry_run=True, workers=8, journal_path=None):
+    """Rename <a>_<b>_<c>_merge.txt files to <a>_<c>.txt; dry_run only prints the plan"""
+    return run_plan(plan_merge_renames(root_path), "rename", workers, journal_path, dry_run)
+
+
+def move_prefixed_files(root_path, destination_path, mode="copy", workers=8, journal_path=None, dry_run=False):
+    """Collect files that start with their folder name into destination_path"""
+    return run_plan(plan_prefixed_moves(root_path, destination_path), mode, workers, journal_path, dry_run)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plan, run and roll back bulk label file moves")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--journal", help="journal file (default: rename_journal_<time>.jsonl)")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without touching files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    collect_parser = subparsers.add_parser("collect", help="collect files that start with their folder name")
+    collect_parser.add_argument("root", nargs='?', default="./",
+                                help="folder to walk; with a trailing separator every file directly in it is collected")
+    collect_parser.add_argument("destination", nargs='?', default="labels")
+    collect_parser.add_argument("--mode", choices=TRANSFER_MODES, default="copy")
+
+    merge_parser = subparsers.add_parser("merge", help="rename *_merge.txt files")
+    merge_parser.add_argument("root", nargs='?', default="./")
+
+    rollback_parser = subparsers.add_parser("rollback", help="undo a previous run from its journal")
+    rollback_parser.add_argument("journal_file")
+    args = parser.parse_args()
+
+    journal_path = args.journal or f"rename_journal_{time.strftime('%Y%m%d_%H%M%S')}.jsonl"
+    if args.command == "collect":
+        ok = move_prefixed_files(args.root, args.destination, args.mode, args.workers, journal_path, args.dry_run)
+    elif args.command == "merge":
+        ok = rename_merge_files(args.root, args.dry_run, args.workers, journal_path)
+    else:
+        undone, failed = rollback(args.journal_file)
+        print(f"Undone: {undone}, failed: {failed}")
+        ok = failed == 0
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,234 @@
+import os
+import cv2
+import json
+import argparse
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from rennips import rennips
+
+from atomic_io import atomic_write_bytes, atomic_write_json
+from catalog import IMAGE_EXTENSIONS, index_images
+from styles import DEFAULT_STYLE, CLASS_STYLES, group_by_style, load_class_styles
+from yolo_labels import read_yolo_obb_labels
+
+
+RENDER_MANIFEST_VERSION = 1
+
+
+def render_overlay(image_path, label_path, scale=1.0, max_side=None, class_styles=CLASS_STYLES,
+                   default_style=DEFAULT_STYLE, draw_labels=True):
+    """
+    Draw the YOLO OBB polygons of label_path onto the image, with the viewer's colors
+    The image is downscaled by `scale` and, if max_side is set, further until its longer
+    side fits. Returns a BGR image, or None if the image cannot be read
+    """
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    height, width = image.shape[:2]
+    factor = scale
+    if max_side is not None:
+        factor = min(factor, max_side / max(width, height))
+    if factor < 1:
+        width, height = max(1, round(width * factor)), max(1, round(height * factor))
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+    classes, coords = read_yolo_obb_labels(label_path)
+    if len(classes) == 0:
+        return image
+    quads = np.round(coords.reshape(-1, 4, 2) * (width, height)).astype(np.int32)
+
+    # One polylines call per style, like the viewer's batched overlay
+    for style, class_ids in group_by_style(np.unique(classes).tolist(), class_styles, default_style):
+        (r, g, b), line_width = style
+        mask = np.isin(classes, class_ids)
+        cv2.polylines(image, list(quads[mask]), True, (b, g, r), line_width, cv2.LINE_AA)
+        if draw_labels:
+            for class_id, quad in zip(classes[mask].tolist(), quads[mask].tolist()):
+                cv2.putText(image, str(class_id), tuple(quad[0]), cv2.FONT_HERSHEY_SIMPLEX, 0.4,
+                            (b, g, r), 1, cv2.LINE_AA)
+    return image
+
+
+def make_contact_sheet(images, columns, tile_size, background=(32, 32, 32)):
+    """Fit each BGR image (None for unreadable ones) into a tile_size square of a grid"""
+    rows = (len(images) + columns - 1) // columns
+    sheet = np.full((rows * tile_size, columns * tile_size, 3), background, dtype=np.uint8)
+    for i, image in enumerate(images):
+        if image is None:
+            continue
+        height, width = image.shape[:2]
+        factor = min(tile_size / width, tile_size / height, 1.0)
+        tile = cv2.resize(image, (max(1, int(width * factor)), max(1, int(height * factor))),
+                          interpolation=cv2.INTER_AREA)
+        y = (i // columns) * tile_size + (tile_size - tile.shape[0]) // 2
+        x = (i % columns) * tile_size + (tile_size - tile.shape[1]) // 2
+        sheet[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+    return sheet
+
+
+def write_jpeg(path, image, quality):
+    ok, data = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise IOError(f"Failed to encode {path}")
+    atomic_write_bytes(path, data.tobytes())
+
+
+def _render_job(job, options):
+    """
+    Render one output: a preview of a single pair or a contact sheet of several
+    Returns True on success
+    """
+    output_path, pairs = job
+    try:
+        images = [render_overlay(image_path, label_path, options["scale"], options["max_side"],
+                                 options["class_styles"], options["default_style"], options["draw_labels"])
+                  for image_path, label_path in pairs]
+        if options["columns"] is None:
+            if images[0] is None:
+                print(f"Error: Failed to read image {pairs[0][0]}")
+                return False
+            write_jpeg(output_path, images[0], options["quality"])
+        else:
+            write_jpeg(output_path, make_contact_sheet(images, options["columns"], options["tile_size"]),
+                       options["quality"])
+        return True
+    except Exception as e:
+        print(f"Error rendering {output_path}: {str(e)}")
+        return False
+
+
+def _render_chunk(jobs, options):
+    return [_render_job(job, options) for job in jobs]
+
+
+def _signature(image_path, label_path):
+    image_stat = os.stat(image_path)
+    label_stat = os.stat(label_path)
+    return [image_stat.st_size, image_stat.st_mtime_ns, label_stat.st_size, label_stat.st_mtime_ns]
+
+
+def load_render_manifest(manifest_path, options_key):
+    """Output name -> input signatures of the last render, empty if the options changed"""
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != RENDER_MANIFEST_VERSION or manifest.get("options") != options_key:
+        return {}
+    return manifest.get("outputs", {})
+
+
+def render_dataset(image_dir, label_dir, output_dir, scale=1.0, max_side=None, columns=None, rows=None,
+                   tile_size=256, quality=90, draw_labels=True, class_styles=CLASS_STYLES,
+                   default_style=DEFAULT_STYLE, workers=1, chunk_size=None, incremental=True,
+                   image_extensions=IMAGE_EXTENSIONS):
+    """
+    Render overlay previews of every image/label pair (paired by stem) into output_dir
+    Without columns every pair gets output_dir/<stem>.jpg; with columns (and rows) the pairs
+    are laid out in stem order on contact sheets output_dir/sheet_00000.jpg, ...
+    With incremental=True, output_dir/.render_manifest.json records the image and label
+    sizes and mtimes behind every output, and outputs whose inputs are unchanged are skipped.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    image_index = index_images(image_dir, image_extensions)
+    with os.scandir(label_dir) as entries:
+        label_stems = {entry.name[:-len('.txt')] for entry in entries
+                       if entry.name.endswith('.txt') and entry.is_file()}
+    stems = sorted(stem for stem in image_index if stem in label_stems)
+    pairs = [(image_index[stem], os.path.join(label_dir, stem + '.txt')) for stem in stems]
+    print(f"Found {len(pairs)} image/label pairs ({len(image_index) - len(pairs)} images and "
+          f"{len(label_stems) - len(pairs)} labels unpaired)")
+
+    options = {"scale": scale, "max_side": max_side, "columns": columns, "tile_size": tile_size,
+               "quality": quality, "draw_labels": draw_labels,
+               "class_styles": class_styles, "default_style": default_style}
+    # JSON round trip so the comparison with the saved manifest does not trip over tuples/int keys
+    options_key = json.loads(json.dumps(dict(options, rows=rows, class_styles=sorted(class_styles.items()))))
+
+    jobs = []
+    if columns is None:
+        for stem, pair in zip(stems, pairs):
+            jobs.append((os.path.join(output_dir, stem + ".jpg"), [pair]))
+    else:
+        per_sheet = columns * (rows or columns)
+        for n, start in enumerate(range(0, len(pairs), per_sheet)):
+            jobs.append((os.path.join(output_dir, f"sheet_{n:05d}.jpg"), pairs[start:start + per_sheet]))
+
+    manifest_path = os.path.join(output_dir, ".render_manifest.json")
+    previous = load_render_manifest(manifest_path, options_key) if incremental else {}
+    outputs = {}
+    todo = []
+    for output_path, job_pairs in jobs:
+        name = os.path.basename(output_path)
+        signature = [[os.path.abspath(image_path), os.path.abspath(label_path)] + _signature(image_path, label_path)
+                     for image_path, label_path in job_pairs]
+        if previous.get(name) == signature and os.path.exists(output_path):
+            outputs[name] = signature
+        else:
+            todo.append(((output_path, job_pairs), name, signature))
+    skipped = len(jobs) - len(todo)
+
+    rendered = 0
+    failed = 0
+    if workers > 1 and len(todo) > 1:
+        if chunk_size is None:
+            chunk_size = max(1, min(64, len(todo) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_render_chunk, [job for job, _, _ in todo[i:i + chunk_size]], options): i
+                       for i in range(0, len(todo), chunk_size)}
+            for future in rennips(as_completed(futures), mode='simple'):
+                for offset, ok in enumerate(future.result()):
+                    _, name, signature = todo[futures[future] + offset]
+                    if ok:
+                        outputs[name] = signature
+                        rendered += 1
+                    else:
+                        failed += 1
+    else:
+        for job, name, signature in rennips(todo, mode='simple'):
+            if _render_job(job, options):
+                outputs[name] = signature
+                rendered += 1
+            else:
+                failed += 1
+
+    if incremental:
+        atomic_write_json(manifest_path, {"version": RENDER_MANIFEST_VERSION, "options": options_key,
+                                          "outputs": outputs})
+
+    print(f"\nRendering completed!")
+    print(f"Rendered: {rendered} files")
+    print(f"Up to date (skipped): {skipped} files")
+    print(f"Failed: {failed} files")
+    print(f"Previews saved to: {output_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render YOLO OBB label overlays for QA")
+    parser.add_argument("--images", default="images", help="image directory")
+    parser.add_argument("--labels", default="labels/DOTA-v1.5_val_RESULT", help="YOLO OBB label directory")
+    parser.add_argument("--output", default="previews", help="output directory")
+    parser.add_argument("--scale", type=float, default=1.0, help="downscale factor, e.g. 0.5")
+    parser.add_argument("--max-side", type=int, help="downscale so the longer side is at most this many pixels")
+    parser.add_argument("--sheet", help="contact sheets of COLSxROWS images instead of one preview per image, e.g. 6x4")
+    parser.add_argument("--tile", type=int, default=256, help="contact sheet tile size in pixels")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG quality")
+    parser.add_argument("--no-labels", action="store_true", help="draw polygons without class ids")
+    parser.add_argument("--styles", help="JSON class style table, see styles.py")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="re-render everything")
+    args = parser.parse_args()
+
+    columns = rows = None
+    if args.sheet:
+        columns, rows = (int(n) for n in args.sheet.lower().split("x"))
+    class_styles, default_style = load_class_styles(args.styles) if args.styles else (CLASS_STYLES, DEFAULT_STYLE)
+
+    render_dataset(args.images, args.labels, args.output, scale=args.scale, max_side=args.max_side,
+                   columns=columns, rows=rows, tile_size=args.tile, quality=args.quality,
+                   draw_labels=not args.no_labels, class_styles=class_styles, default_style=default_style,
+                   workers=args.workers, incremental=not args.force)
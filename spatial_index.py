@@ -0,0 +1,133 @@
+import numpy as np
+
+
+def points_in_quads(x, y, quads):
+    """
+    Vectorized crossing-number test of one point against an (M, 8) array of quads
+    Same edge rules as the scalar ray-casting test the viewer used, returns an (M,) bool array
+    """
+    px = quads[:, 0::2]
+    py = quads[:, 1::2]
+    nx = np.roll(px, -1, axis=1)
+    ny = np.roll(py, -1, axis=1)
+
+    spans = (y > np.minimum(py, ny)) & (y <= np.maximum(py, ny)) & (x <= np.maximum(px, nx))
+    dy = ny - py
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xinters = (y - py) * (nx - px) / np.where(dy == 0, 1, dy) + px
+    crossings = spans & ((px == nx) | (x <= xinters))
+    return np.count_nonzero(crossings, axis=1) % 2 == 1
+
+
+class QuadGridIndex:
+    """
+    Uniform grid over the normalized [0, 1] image plane bucketing quads by bounding box
+    Hit tests only look at the quads registered in the clicked cell
+    """
+    def __init__(self, polygons, cells_per_axis=None):
+        self.quads = np.array(polygons, dtype=np.float64).reshape(-1, 8)
+        if cells_per_axis is None:
+            # About one quad per cell for uniformly spread objects, capped for huge scenes
+            cells_per_axis = int(np.clip(np.sqrt(len(self.quads)), 1, 256))
+        self.cells_per_axis = cells_per_axis
+        self.cells = {}
+        self.cell_ranges = [None] * len(self.quads)
+        for i in range(len(self.quads)):
+            self._insert(i)
+
+    def __len__(self):
+        return len(self.quads)
+
+    def _cell_range(self, quad):
+        n = self.cells_per_axis
+        xs, ys = quad[0::2], quad[1::2]
+        x0 = min(max(int(xs.min() * n), 0), n - 1)
+        x1 = min(max(int(xs.max() * n), 0), n - 1)
+        y0 = min(max(int(ys.min() * n), 0), n - 1)
+        y1 = min(max(int(ys.max() * n), 0), n - 1)
+        return x0, y0, x1, y1
+
+    def _insert(self, i):
+        x0, y0, x1, y1 = self.cell_ranges[i] = self._cell_range(self.quads[i])
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self.cells.setdefault((cx, cy), set()).add(i)
+
+    def _discard(self, i):
+        x0, y0, x1, y1 = self.cell_ranges[i]
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells[(cx, cy)]
+                cell.discard(i)
+                if not cell:
+                    del self.cells[(cx, cy)]
+
+    def update(self, i, polygon):
+        """Re-bucket quad i after one of its vertices moved"""
+        self.quads[i] = polygon
+        new_range = self._cell_range(self.quads[i])
+        if new_range != self.cell_ranges[i]:
+            self._discard(i)
+            self._insert(i)
+
+    def remove(self, i):
+        """Drop quad i; quads after it shift down by one like the polygon list does"""
+        self._discard(i)
+        self.quads = np.delete(self.quads, i, axis=0)
+        del self.cell_ranges[i]
+        for key, cell in self.cells.items():
+            if any(j > i for j in cell):
+                self.cells[key] = {j - 1 if j > i else j for j in cell}
+
+    def insert(self, i, polygon):
+        """Add a quad at index i; quads from i on shift up by one, the inverse of remove"""
+        for key, cell in self.cells.items():
+            if any(j >= i for j in cell):
+                self.cells[key] = {j + 1 if j >= i else j for j in cell}
+        self.quads = np.insert(self.quads, i, polygon, axis=0)
+        self.cell_ranges.insert(i, None)
+        self._insert(i)
+
+    def candidates(self, x, y):
+        n = self.cells_per_axis
+        # Quads reaching past the image border are bucketed into the edge cells
+        cx = min(max(int(x * n), 0), n - 1)
+        cy = min(max(int(y * n), 0), n - 1)
+        cell = self.cells.get((cx, cy))
+        if not cell:
+            return np.empty(0, dtype=np.int64)
+        return np.fromiter(cell, dtype=np.int64, count=len(cell))
+
+    def query_rect(self, x0, y0, x1, y1):
+        """Sorted indices of the quads whose bounding box overlaps the normalized rectangle"""
+        if len(self.quads) == 0 or x1 < x0 or y1 < y0:
+            return np.empty(0, dtype=np.int64)
+        n = self.cells_per_axis
+        cx0, cx1 = min(max(int(x0 * n), 0), n - 1), min(max(int(x1 * n), 0), n - 1)
+        cy0, cy1 = min(max(int(y0 * n), 0), n - 1), min(max(int(y1 * n), 0), n - 1)
+        if (cx0, cy0, cx1, cy1) == (0, 0, n - 1, n - 1):
+            # Whole image visible, no need to walk the grid
+            return np.arange(len(self.quads))
+
+        ids = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                ids.update(self.cells.get((cx, cy), ()))
+        ids = np.array(sorted(ids), dtype=np.int64)
+        if len(ids) == 0:
+            return ids
+        quads = self.quads[ids]
+        xs, ys = quads[:, 0::2], quads[:, 1::2]
+        overlap = ((xs.max(axis=1) >= x0) & (xs.min(axis=1) <= x1) &
+                   (ys.max(axis=1) >= y0) & (ys.min(axis=1) <= y1))
+        return ids[overlap]
+
+    def hit_test(self, x, y):
+        """Return the lowest index of a quad containing (x, y), or None"""
+        ids = self.candidates(x, y)
+        if len(ids) == 0:
+            return None
+        hits = ids[points_in_quads(x, y, self.quads[ids])]
+        if len(hits) == 0:
+            return None
+        return int(hits.min())
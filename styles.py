@@ -0,0 +1,39 @@
+import json
+
+
+# Polygon styles shared by the viewer and the offline renderers: (RGB color, line width)
+# Classes without an entry in CLASS_STYLES are drawn with DEFAULT_STYLE
+SELECTED_STYLE = ((255, 0, 0), 2)
+DEFAULT_STYLE = ((0, 255, 0), 1)
+CLASS_STYLES = {
+    0: ((255, 255, 0), 4),
+    9: ((0, 0, 255), 1),
+}
+
+
+def load_class_styles(path):
+    """
+    Read a class style table from a JSON file
+    {"default": {"color": [0, 255, 0], "width": 1}, "classes": {"0": {"color": [255, 255, 0], "width": 4}}}
+    Returns (class_styles, default_style); a missing "default" keeps DEFAULT_STYLE
+    """
+    with open(path, 'r') as f:
+        table = json.load(f)
+
+    def parse(entry):
+        return tuple(int(c) for c in entry["color"]), int(entry.get("width", 1))
+
+    default_style = parse(table["default"]) if "default" in table else DEFAULT_STYLE
+    class_styles = {int(class_id): parse(entry) for class_id, entry in table.get("classes", {}).items()}
+    return class_styles, default_style
+
+
+def group_by_style(class_ids, class_styles=CLASS_STYLES, default_style=DEFAULT_STYLE):
+    """
+    Map every style to the class ids drawn with it, in a fixed drawing order
+    Default first, so that styled classes end up on top
+    """
+    groups = {}
+    for class_id in class_ids:
+        groups.setdefault(class_styles.get(class_id, default_style), []).append(class_id)
+    return sorted(groups.items(), key=lambda item: item[0] != default_style)
@@ -0,0 +1,26 @@
+import os
+import stat
+
+import pytest
+
+from atomic_io import atomic_write_bytes, atomic_write_text
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="POSIX permission bits")
+@pytest.mark.parametrize("mode", [0o644, 0o664, 0o600, 0o444])
+def test_overwrite_keeps_mode(tmp_path, mode):
+    path = tmp_path / "000.txt"
+    path.write_text("0 0.1 0.1 0.2 0.1 0.2 0.2 0.1 0.2\n")
+    os.chmod(path, mode)
+    atomic_write_text(str(path), "10 0.1 0.1 0.2 0.1 0.2 0.2 0.1 0.2\n")
+    assert stat.S_IMODE(os.stat(path).st_mode) == mode
+    assert path.read_text().startswith("10 ")
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="POSIX permission bits")
+def test_new_file_follows_umask(tmp_path):
+    umask = os.umask(0o022)
+    os.umask(umask)
+    atomic_write_bytes(str(tmp_path / "new.txt"), b"data")
+    assert stat.S_IMODE(os.stat(tmp_path / "new.txt").st_mode) == 0o666 & ~umask
+    assert os.listdir(tmp_path) == ["new.txt"]
@@ -0,0 +1,25 @@
+import os
+import stat
+
+import pytest
+
+from change_classes import remap_classes
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="POSIX permission bits")
+def test_remap_keeps_label_modes(tmp_path):
+    (tmp_path / "sub").mkdir()
+    modes = {"a.txt": 0o644, "b.txt": 0o664, os.path.join("sub", "c.txt"): 0o640}
+    for name, mode in modes.items():
+        path = tmp_path / name
+        path.write_text("0 0.1 0.1 0.2 0.1 0.2 0.2 0.1 0.2\n3 0.1 0.1 0.2 0.1 0.2 0.2 0.1 0.2\n")
+        os.chmod(path, mode)
+
+    totals = remap_classes(str(tmp_path), {0: 10, 3: 0}, recursive=True, workers=2, chunk_size=1, verbose=False)
+
+    assert totals[(0, 10)] == 3 and totals[(3, 0)] == 3
+    for name, mode in modes.items():
+        path = tmp_path / name
+        assert path.read_text().split("\n")[0].startswith("10 ")
+        assert path.read_text().split("\n")[1].startswith("0 ")
+        assert stat.S_IMODE(os.stat(path).st_mode) == mode
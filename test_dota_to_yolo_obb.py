@@ -0,0 +1,186 @@
+import os
+import re
+import zlib
+import struct
+import random
+
+import pytest
+
+from label_formats import DOTA_CLASSES
+from DOTAtoYoloOBB import convert_dota_to_yolo_obb, process_dataset
+
+
+def reference_convert(label_path, img_width, img_height):
+    """The original per-line converter, kept as the reference output"""
+    def normalize_coordinates(x, y):
+        return x / img_width, y / img_height
+
+    converted_lines = []
+    with open(label_path, 'r') as f:
+        lines = f.readlines()[2:]  # Skip imagesource and gsd lines
+
+        for line in lines:
+            parts = line.strip().split()
+
+            x1, y1, x2, y2, x3, y3, x4, y4 = map(float, parts[:8])
+            class_name = parts[8].replace("-", " ")
+            difficult = int(parts[-1])
+            class_index = DOTA_CLASSES[class_name]
+
+            x1_norm, y1_norm = normalize_coordinates(x1, y1)
+            x2_norm, y2_norm = normalize_coordinates(x2, y1)
+            x3_norm, y3_norm = normalize_coordinates(x3, y3)
+            x4_norm, y4_norm = normalize_coordinates(x4, y4)
+
+            yolo_line = f"{class_index} {x1_norm:.6f} {y1_norm:.6f} {x2_norm:.6f} {y2_norm:.6f} "
+            yolo_line += f"{x3_norm:.6f} {y3_norm:.6f} {x4_norm:.6f} {y4_norm:.6f}"
+
+            converted_lines.append(yolo_line)
+
+    return converted_lines
+
+
+def write_png(path, width, height):
+    """Smallest valid grayscale PNG of the given size (sizes are read from the header only)"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    pixels = zlib.compress(b''.join(b'\0' + b'\0' * width for _ in range(height)))
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+                + chunk(b'IDAT', pixels) + chunk(b'IEND', b''))
+
+
+def write_dota(path, rows, rng):
+    """rows of (class name, difficult); coordinates are random pixel values with decimals"""
+    with open(path, 'w') as f:
+        f.write("imagesource:GoogleEarth\ngsd:0.146343590398\n")
+        for class_name, difficult in rows:
+            coords = " ".join(f"{rng.uniform(0, 1200):.{rng.choice((0, 1, 3))}f}" for _ in range(8))
+            f.write(f"{coords} {class_name.replace(' ', '-')} {difficult}\n")
+
+
+def make_dataset(directory, count, seed=0):
+    """count image/label pairs with random sizes and objects; returns (image_dir, label_dir, sizes)"""
+    rng = random.Random(seed)
+    image_dir = os.path.join(directory, "images")
+    label_dir = os.path.join(directory, "labels")
+    os.makedirs(image_dir)
+    os.makedirs(label_dir)
+    sizes = {}
+    for i in range(count):
+        stem = f"P{i:04d}"
+        sizes[stem] = rng.randint(200, 1500), rng.randint(200, 1500)
+        write_png(os.path.join(image_dir, stem + ".png"), *sizes[stem])
+        rows = [(rng.choice(list(DOTA_CLASSES)), rng.randint(0, 1)) for _ in range(rng.randint(0, 40))]
+        write_dota(os.path.join(label_dir, stem + ".txt"), rows, rng)
+    return image_dir, label_dir, sizes
+
+
+def test_batch_converter_matches_per_line_output(tmp_path):
+    image_dir, label_dir, sizes = make_dataset(str(tmp_path), 40)
+    for stem, (width, height) in sizes.items():
+        label_path = os.path.join(label_dir, stem + ".txt")
+        converted = convert_dota_to_yolo_obb(label_path, os.path.join(image_dir, stem + ".png"))
+        assert converted == reference_convert(label_path, width, height)
+
+
+def test_second_vertex_keeps_y1(tmp_path):
+    write_png(str(tmp_path / "a.png"), 100, 200)
+    (tmp_path / "a.txt").write_text("imagesource:x\ngsd:1\n10 20 30 40 50 60 70 80 plane 0\n")
+    converted = convert_dota_to_yolo_obb(str(tmp_path / "a.txt"), str(tmp_path / "a.png"))
+    assert converted == ["0 0.100000 0.100000 0.300000 0.100000 0.500000 0.300000 0.700000 0.400000"]
+    assert converted == reference_convert(str(tmp_path / "a.txt"), 100, 200)
+
+
+def test_empty_label_file(tmp_path):
+    write_png(str(tmp_path / "a.png"), 100, 100)
+    (tmp_path / "a.txt").write_text("imagesource:x\ngsd:1\n")
+    assert convert_dota_to_yolo_obb(str(tmp_path / "a.txt"), str(tmp_path / "a.png")) == []
+    assert reference_convert(str(tmp_path / "a.txt"), 100, 100) == []
+
+
+def test_unknown_class_raises_key_error(tmp_path):
+    write_png(str(tmp_path / "a.png"), 100, 100)
+    (tmp_path / "a.txt").write_text("imagesource:x\ngsd:1\n1 2 3 4 5 6 7 8 plane 0\n1 2 3 4 5 6 7 8 spaceship 0\n")
+    with pytest.raises(KeyError):
+        reference_convert(str(tmp_path / "a.txt"), 100, 100)
+    with pytest.raises(KeyError):
+        convert_dota_to_yolo_obb(str(tmp_path / "a.txt"), str(tmp_path / "a.png"))
+
+
+def test_bad_difficult_flag_raises_value_error(tmp_path):
+    write_png(str(tmp_path / "a.png"), 100, 100)
+    (tmp_path / "a.txt").write_text("imagesource:x\ngsd:1\n1 2 3 4 5 6 7 8 plane 0\n1 2 3 4 5 6 7 8 ship x\n")
+    with pytest.raises(ValueError):
+        reference_convert(str(tmp_path / "a.txt"), 100, 100)
+    with pytest.raises(ValueError, match="line 4: difficult flag must be an integer, got 'x'"):
+        convert_dota_to_yolo_obb(str(tmp_path / "a.txt"), str(tmp_path / "a.png"))
+
+
+def read_outputs(output_dir):
+    return {name: open(os.path.join(output_dir, name), 'rb').read()
+            for name in sorted(os.listdir(output_dir)) if name.endswith('.txt')}
+
+
+def read_counters(output):
+    return {key: int(value) for key, value in
+            re.findall(r"^(Successfully processed|Failed|Total): (\d+) files$", output, re.MULTILINE)}
+
+
+def test_parallel_output_matches_serial(tmp_path, capsys):
+    image_dir, label_dir, sizes = make_dataset(str(tmp_path), 60, seed=1)
+    # A label without an image and an unreadable label count as failed in both modes
+    write_dota(os.path.join(label_dir, "orphan.txt"), [("ship", 0)], random.Random(2))
+    with open(os.path.join(label_dir, "P0003.txt"), 'a') as f:
+        f.write("1 2 3 4 5 6 7 8 spaceship 0\n")
+
+    counters = {}
+    outputs = {}
+    for workers in (1, 4):
+        output_dir = str(tmp_path / f"out_{workers}")
+        capsys.readouterr()
+        process_dataset(image_dir, label_dir, output_dir, size_cache_path=str(tmp_path / f"sizes_{workers}.json"),
+                        workers=workers, chunk_size=7)
+        counters[workers] = read_counters(capsys.readouterr().out)
+        outputs[workers] = read_outputs(output_dir)
+
+    assert counters[1] == {"Successfully processed": 59, "Failed": 2, "Total": 61}
+    assert counters[4] == counters[1]
+    assert len(outputs[1]) == 59
+    assert outputs[4] == outputs[1]
+
+
+def test_outputs_of_labels_that_stop_converting_are_removed(tmp_path, capsys):
+    image_dir, label_dir, sizes = make_dataset(str(tmp_path), 5, seed=3)
+    output_dir = str(tmp_path / "out")
+    process_dataset(image_dir, label_dir, output_dir)
+    assert len(read_outputs(output_dir)) == 5
+
+    # One label no longer converts, another lost its image
+    with open(os.path.join(label_dir, "P0001.txt"), 'a') as f:
+        f.write("1 2 3 4 5 6 7 8 spaceship 0\n")
+    os.remove(os.path.join(image_dir, "P0002.png"))
+    capsys.readouterr()
+    process_dataset(image_dir, label_dir, output_dir, shard_path=str(tmp_path / "shard"))
+    output = capsys.readouterr().out
+
+    assert sorted(read_outputs(output_dir)) == ["P0000.txt", "P0003.txt", "P0004.txt"]
+    assert "Removed stale outputs: 2 files" in output
+    assert "Packed 3 label files" in output
+
+
+def test_images_are_not_stat_again_after_the_directory_scan(tmp_path, monkeypatch, capsys):
+    image_dir, label_dir, sizes = make_dataset(str(tmp_path), 6, seed=4)
+    image_stats = []
+    real_stat = os.stat
+
+    def counting_stat(path, *args, **kwargs):
+        if os.path.dirname(os.path.abspath(path)) == image_dir:
+            image_stats.append(path)
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "stat", counting_stat)
+    process_dataset(image_dir, label_dir, str(tmp_path / "out"))
+    assert image_stats == []
+    assert len(read_outputs(str(tmp_path / "out"))) == 6
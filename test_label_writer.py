@@ -0,0 +1,24 @@
+import os
+import stat
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from label_writer import LabelWriter
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="POSIX permission bits")
+def test_save_keeps_shared_label_readable(tmp_path):
+    path = tmp_path / "000.txt"
+    path.write_text("0 0.1 0.1 0.2 0.1 0.2 0.2 0.1 0.2\n")
+    os.chmod(path, 0o664)
+    writer = LabelWriter(delay=0)
+    try:
+        writer.save(str(path), "9 0.1 0.1 0.2 0.1 0.2 0.2 0.1 0.2\n")
+        writer.save(str(path), "10 0.1 0.1 0.2 0.1 0.2 0.2 0.1 0.2\n")
+        assert writer.flush(timeout=5)
+    finally:
+        writer.close()
+    assert path.read_text() == "10 0.1 0.1 0.2 0.1 0.2 0.2 0.1 0.2\n"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o664
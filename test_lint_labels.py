@@ -0,0 +1,9 @@
+from lint_labels import lint_file
+
+
+def test_bad_dota_difficult_flag_is_reported_as_malformed(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("imagesource:x\ngsd:1\n0 0 10 0 10 10 0 10 plane 0\n0 0 10 0 10 10 0 10 ship x\n")
+    issues, coords, lines = lint_file(str(path), "dota", set())
+    assert issues == [(4, "malformed", "difficult flag must be an integer, got 'x'")]
+    assert lines == [3]
@@ -0,0 +1,31 @@
+import os
+
+from rename_files import plan_prefixed_moves, move_prefixed_files
+
+
+def make_tree(root):
+    os.makedirs(os.path.join(root, "P0001"))
+    for path in ("top.txt", "P0001/P0001_a.txt", "P0001/other.txt"):
+        with open(os.path.join(root, path), 'w') as f:
+            f.write(path)
+
+
+def test_root_with_trailing_separator_collects_all_root_files(tmp_path):
+    root = str(tmp_path / "data")
+    make_tree(root)
+    destination = os.path.join(root, "labels")
+    plan = plan_prefixed_moves(root + os.sep, destination)
+    assert sorted(os.path.basename(src) for src, _ in plan) == ["P0001_a.txt", "top.txt"]
+    # Without the separator the root folder name is a real prefix
+    assert [os.path.basename(src) for src, _ in plan_prefixed_moves(root, destination)] == ["P0001_a.txt"]
+
+
+def test_journal_line_only_when_a_journal_is_written(tmp_path, capsys):
+    root = str(tmp_path / "data")
+    make_tree(root)
+    assert move_prefixed_files(root, str(tmp_path / "out"))
+    assert "Journal:" not in capsys.readouterr().out
+
+    journal_path = str(tmp_path / "journal.jsonl")
+    assert move_prefixed_files(root, str(tmp_path / "out2"), journal_path=journal_path)
+    assert f"Journal: {journal_path}" in capsys.readouterr().out
@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+import pytest
+
+from PyQt5.QtGui import QImage
+
+from tile_cache import build_tile_pyramid, qimage_to_array
+
+
+def random_image(width, height, image_format, seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width * 4), dtype=np.uint8)
+    image = QImage(pixels.data, width, height, width * 4, QImage.Format_RGB32).convertToFormat(image_format)
+    return image.copy()
+
+
+@pytest.mark.parametrize("image_format", [QImage.Format_RGB32, QImage.Format_Grayscale8, QImage.Format_ARGB32])
+def test_banded_level0_matches_full_conversion(tmp_path, image_format):
+    image_path = str(tmp_path / "a.png")
+    assert random_image(37, 53, image_format).save(image_path)
+
+    target_dir = str(tmp_path / "pyramid")
+    build_tile_pyramid(image_path, target_dir, tile_size=16, band_rows=7)
+    level0 = np.load(os.path.join(target_dir, "level0.npy"))
+    np.testing.assert_array_equal(level0, qimage_to_array(QImage(image_path)))
+
+
+def test_qimage_to_array_writes_into_out():
+    image = random_image(9, 5, QImage.Format_RGB32)
+    out = np.zeros((7, 9, 3), dtype=np.uint8)
+    assert qimage_to_array(image, out[1:6]).base is out
+    np.testing.assert_array_equal(out[1:6], qimage_to_array(image))
+    assert not out[0].any() and not out[6].any()
@@ -0,0 +1,399 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import hashlib
+import threading
+import numpy as np
+
+from collections import OrderedDict
+
+from PyQt5.QtGui import QImage, QImageReader, QImageIOHandler, QPainter
+from PyQt5.QtCore import Qt, QRect, QRectF
+
+from image_size import read_image_size
+
+
+# Images with more pixels than this are opened through the tile pyramid
+TILED_IMAGE_MIN_PIXELS = 8192 * 8192
+DEFAULT_TILE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "obbe", "tiles")
+# Pyramids are evicted, least recently opened first, once the cache grows past this
+DEFAULT_TILE_CACHE_MAX_BYTES = 8 * 1024 ** 3
+TILE_CACHE_VERSION = 2
+# Unfinished pyramid builds older than this are left over from a crash
+STALE_BUILD_SECONDS = 24 * 3600
+
+
+def qimage_to_array(image, out=None):
+    """
+    (H, W, 3) uint8 R, G, B pixels of a QImage
+    Written straight into out (e.g. a memmap slice) if given, otherwise into a new array
+    """
+    image = image.convertToFormat(QImage.Format_RGB888)
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    rows = np.frombuffer(ptr, dtype=np.uint8).reshape(image.height(), image.bytesPerLine())
+    pixels = rows[:, :image.width() * 3].reshape(image.height(), image.width(), 3)
+    if out is None:
+        # The buffer belongs to the converted QImage
+        return pixels.copy()
+    out[...] = pixels
+    return out
+
+
+def array_to_qimage(array):
+    """Copy an (H, W, 3) uint8 R, G, B array into a new Format_RGB32 QImage"""
+    array = np.ascontiguousarray(array)
+    height, width = array.shape[:2]
+    return QImage(array.data, width, height, width * 3, QImage.Format_RGB888).convertToFormat(QImage.Format_RGB32)
+
+
+def _downsample(src, dst, band_rows=1024):
+    """2x2 box filter from one pyramid level into the next, a band of rows at a time"""
+    height, width = dst.shape[:2]
+    for y in range(0, height, band_rows):
+        rows = min(band_rows, height - y)
+        block = src[2 * y:2 * (y + rows)]
+        # Odd source sizes: repeat the last row/column so every output pixel has 2x2 inputs
+        if block.shape[0] < 2 * rows:
+            block = np.concatenate([block, block[-1:]], axis=0)
+        if block.shape[1] < 2 * width:
+            block = np.concatenate([block, block[:, -1:]], axis=1)
+        block = block.astype(np.uint16)
+        dst[y:y + rows] = ((block[0::2, 0::2] + block[0::2, 1::2] +
+                            block[1::2, 0::2] + block[1::2, 1::2] + 2) // 4).astype(np.uint8)
+
+
+def build_tile_pyramid(image_path, target_dir, tile_size, band_rows=2048):
+    """
+    Decode image_path once into memory-mapped RGB pyramid levels under target_dir
+    Level 0 is full resolution, every next level halves both sides until one tile covers it.
+    Formats whose reader supports clip rects (JPEG) are decoded in bands of rows, others
+    need a single full decode which is converted to RGB band by band and released as soon
+    as level 0 is written.
+    """
+    reader = QImageReader(image_path)
+    size = reader.size()
+    if not size.isValid():
+        raise IOError(f"Failed to read image header: {image_path}")
+    width, height = size.width(), size.height()
+
+    tmp_dir = f"{target_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+    os.makedirs(tmp_dir)
+    try:
+        level = np.lib.format.open_memmap(os.path.join(tmp_dir, "level0.npy"), mode='w+',
+                                          dtype=np.uint8, shape=(height, width, 3))
+        if reader.supportsOption(QImageIOHandler.ClipRect):
+            for y in range(0, height, band_rows):
+                rows = min(band_rows, height - y)
+                band_reader = QImageReader(image_path)
+                band_reader.setClipRect(QRect(0, y, width, rows))
+                band = band_reader.read()
+                if band.isNull():
+                    raise IOError(f"Failed to decode image: {image_path}")
+                qimage_to_array(band, level[y:y + rows])
+        else:
+            image = reader.read()
+            if image.isNull():
+                raise IOError(f"Failed to decode image: {image_path}")
+            # Converting the whole image at once would hold two more full-size copies
+            for y in range(0, height, band_rows):
+                rows = min(band_rows, height - y)
+                qimage_to_array(image.copy(0, y, width, rows), level[y:y + rows])
+            del image
+        level.flush()
+
+        levels = 1
+        while max(level.shape[0], level.shape[1]) > tile_size:
+            next_level = np.lib.format.open_memmap(
+                os.path.join(tmp_dir, f"level{levels}.npy"), mode='w+', dtype=np.uint8,
+                shape=((level.shape[0] + 1) // 2, (level.shape[1] + 1) // 2, 3))
+            _downsample(level, next_level)
+            next_level.flush()
+            level = next_level
+            levels += 1
+        del level
+
+        with open(os.path.join(tmp_dir, "meta.json"), 'w') as f:
+            json.dump({"version": TILE_CACHE_VERSION, "width": width, "height": height,
+                       "levels": levels, "tile_size": tile_size}, f)
+        try:
+            os.replace(tmp_dir, target_dir)
+        except OSError:
+            # Another thread or process finished the same pyramid first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _dir_size(path):
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                size += os.stat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def tile_cache_entries(cache_dir=DEFAULT_TILE_CACHE_DIR):
+    """
+    (last access time, size in bytes, path) of every pyramid in cache_dir, oldest first
+    Opening a pyramid touches its meta.json, so its mtime is the last access
+    (st_atime is unreliable on noatime/relatime mounts)
+    """
+    entries = []
+    try:
+        names = os.listdir(cache_dir)
+    except FileNotFoundError:
+        return entries
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        if not os.path.isdir(path) or name.endswith(".tmp"):
+            continue
+        try:
+            accessed = os.stat(os.path.join(path, "meta.json")).st_mtime
+        except OSError:
+            accessed = os.stat(path).st_mtime
+        entries.append((accessed, _dir_size(path), path))
+    entries.sort()
+    return entries
+
+
+def prune_tile_cache(cache_dir=DEFAULT_TILE_CACHE_DIR, max_bytes=DEFAULT_TILE_CACHE_MAX_BYTES, keep=()):
+    """
+    Delete the least recently opened pyramids until the cache fits in max_bytes
+    Pyramids in keep are never deleted; leftovers of crashed builds are removed as well.
+    Memory-mapped levels of a deleted pyramid stay readable until they are closed.
+    Returns (deleted pyramids, freed bytes)
+    """
+    keep = {os.path.abspath(path) for path in keep}
+    now = time.time()
+    try:
+        names = os.listdir(cache_dir)
+    except FileNotFoundError:
+        return 0, 0
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        try:
+            if name.endswith(".tmp") and now - os.stat(path).st_mtime > STALE_BUILD_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+    entries = tile_cache_entries(cache_dir)
+    total = sum(size for _, size, _ in entries)
+    deleted = 0
+    freed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        freed += size
+        deleted += 1
+    return deleted, freed
+
+
+def clear_tile_cache(cache_dir=DEFAULT_TILE_CACHE_DIR):
+    """Delete every pyramid in cache_dir; returns (deleted pyramids, freed bytes)"""
+    return prune_tile_cache(cache_dir, max_bytes=0)
+
+
+class TiledImage:
+    """
+    Tile-pyramid image backend for very large images
+    Pixels live in memory-mapped pyramid levels on disk. Drawing only touches the tiles
+    that intersect the visible area at the closest pyramid level, so memory is bounded by
+    the viewport and a small tile LRU instead of the image size. Mirrors the parts of the
+    QImage API the viewer uses (width, height, copy, scaled, sizeInBytes).
+    Building a new pyramid prunes the cache directory down to max_cache_bytes.
+    """
+    def __init__(self, image_path, cache_dir=DEFAULT_TILE_CACHE_DIR, tile_size=512, max_tiles=64,
+                 max_cache_bytes=DEFAULT_TILE_CACHE_MAX_BYTES):
+        stat = os.stat(image_path)
+        key = f"{os.path.abspath(image_path)}|{stat.st_size}|{stat.st_mtime_ns}|{tile_size}"
+        self.cache_path = os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest())
+
+        meta = self._read_meta()
+        if meta is None:
+            os.makedirs(cache_dir, exist_ok=True)
+            build_tile_pyramid(image_path, self.cache_path, tile_size)
+            meta = self._read_meta()
+            deleted, freed = prune_tile_cache(cache_dir, max_cache_bytes, keep=(self.cache_path,))
+            if deleted:
+                print(f"Tile cache: evicted {deleted} pyramids ({freed / 1024 ** 2:.0f} MiB)")
+        else:
+            # Mark as recently used for the LRU eviction
+            try:
+                os.utime(os.path.join(self.cache_path, "meta.json"))
+            except OSError:
+                pass
+
+        self._width = meta["width"]
+        self._height = meta["height"]
+        self.tile_size = meta["tile_size"]
+        self.levels = [np.load(os.path.join(self.cache_path, f"level{n}.npy"), mmap_mode='r')
+                       for n in range(meta["levels"])]
+
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.cache_path, "meta.json"), 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get("version") == TILE_CACHE_VERSION else None
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def isNull(self):
+        return False
+
+    def sizeInBytes(self):
+        with self.lock:
+            return sum(tile.sizeInBytes() for tile in self.tiles.values())
+
+    def _tile(self, n, tx, ty):
+        key = (n, tx, ty)
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is not None:
+                self.tiles.move_to_end(key)
+                return tile
+        size = self.tile_size
+        tile = array_to_qimage(self.levels[n][ty * size:(ty + 1) * size, tx * size:(tx + 1) * size])
+        with self.lock:
+            self.tiles[key] = tile
+            while len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+        return tile
+
+    def level_for_scale(self, scale):
+        """Coarsest pyramid level that still has at least one level pixel per screen pixel"""
+        n = 0
+        while n + 1 < len(self.levels) and scale * 2 ** (n + 1) <= 1:
+            n += 1
+        return n
+
+    def draw(self, painter, target, visible=None):
+        """
+        Draw the image into target (QRectF, screen coordinates of the whole image)
+        Only tiles intersecting visible (QRect, defaults to the painter's clip or target) are read
+        """
+        if visible is None:
+            visible = target.toAlignedRect()
+        visible = QRectF(visible).intersected(target)
+        if visible.isEmpty():
+            return
+
+        scale = target.width() / self._width
+        n = self.level_for_scale(scale)
+        level = self.levels[n]
+        level_scale = scale * 2 ** n  # screen pixels per level pixel
+        size = self.tile_size
+
+        # Visible area in level pixels, then the tile range covering it
+        x0 = (visible.left() - target.left()) / level_scale
+        y0 = (visible.top() - target.top()) / level_scale
+        x1 = (visible.right() - target.left()) / level_scale
+        y1 = (visible.bottom() - target.top()) / level_scale
+        tx0, ty0 = max(int(x0 // size), 0), max(int(y0 // size), 0)
+        tx1 = min(int(x1 // size), (level.shape[1] - 1) // size)
+        ty1 = min(int(y1 // size), (level.shape[0] - 1) // size)
+
+        painter.save()
+        painter.setClipRect(visible, Qt.IntersectClip)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        for ty in range(ty0, ty1 + 1):
+            for tx in range(tx0, tx1 + 1):
+                tile = self._tile(n, tx, ty)
+                painter.drawImage(QRectF(target.left() + tx * size * level_scale,
+                                         target.top() + ty * size * level_scale,
+                                         tile.width() * level_scale,
+                                         tile.height() * level_scale), tile)
+        painter.restore()
+
+    def scaled(self, width, height, aspect_mode=Qt.KeepAspectRatio):
+        """Render the whole image at screen size from the closest pyramid level"""
+        if aspect_mode == Qt.KeepAspectRatio:
+            # Same rounding as QSize.scaled, so both backends produce the same drawing size
+            scaled_width = height * self._width // self._height
+            if scaled_width <= width:
+                width = max(1, scaled_width)
+            else:
+                height = max(1, width * self._height // self._width)
+        image = QImage(width, height, QImage.Format_RGB32)
+        image.fill(Qt.black)
+        painter = QPainter(image)
+        self.draw(painter, QRectF(0, 0, width, height))
+        painter.end()
+        return image
+
+    def copy(self, x, y, width, height):
+        """
+        Full resolution crop, read straight from the level 0 memory map
+        Like QImage.copy, areas outside the image are filled (black) instead of clipped
+        """
+        if width <= 0 or height <= 0:
+            return QImage()
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self._width), min(y + height, self._height)
+        if (x0, y0, x1, y1) == (x, y, x + width, y + height):
+            return array_to_qimage(self.levels[0][y0:y1, x0:x1])
+
+        crop = QImage(width, height, QImage.Format_RGB32)
+        crop.fill(Qt.black)
+        if x1 > x0 and y1 > y0:
+            painter = QPainter(crop)
+            painter.drawImage(x0 - x, y0 - y, array_to_qimage(self.levels[0][y0:y1, x0:x1]))
+            painter.end()
+        return crop
+
+
+def open_image(image_path, tile_cache_dir=DEFAULT_TILE_CACHE_DIR, min_tiled_pixels=TILED_IMAGE_MIN_PIXELS):
+    """
+    Open an image for the viewer: a plain QImage, or a TiledImage for very large images
+    Returns None if the image cannot be read
+    """
+    size = read_image_size(image_path)
+    if size is not None and size[0] * size[1] >= min_tiled_pixels:
+        try:
+            return TiledImage(image_path, tile_cache_dir)
+        except (IOError, OSError) as e:
+            print(f"Warning: Tile cache unavailable for {image_path}, decoding directly: {str(e)}")
+    image = QImage(image_path)
+    return None if image.isNull() else image
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect or shrink the tile pyramid cache")
+    parser.add_argument("--cache-dir", default=DEFAULT_TILE_CACHE_DIR)
+    parser.add_argument("--clear", action="store_true", help="delete every cached pyramid")
+    parser.add_argument("--prune", type=float, metavar="GB", help="evict least recently opened pyramids down to GB")
+    args = parser.parse_args()
+
+    if args.clear:
+        deleted, freed = clear_tile_cache(args.cache_dir)
+    elif args.prune is not None:
+        deleted, freed = prune_tile_cache(args.cache_dir, int(args.prune * 1024 ** 3))
+    else:
+        entries = tile_cache_entries(args.cache_dir)
+        for accessed, size, path in entries:
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(accessed))}  {size / 1024 ** 2:10.1f} MiB  {path}")
+        print(f"{len(entries)} pyramids, {sum(size for _, size, _ in entries) / 1024 ** 3:.2f} GiB in {args.cache_dir}")
+        sys.exit(0)
+    print(f"Deleted {deleted} pyramids, freed {freed / 1024 ** 2:.1f} MiB")
@@ -0,0 +1,74 @@
+class ViewTransform:
+    """
+    Maps normalized image coordinates to screen coordinates for a zoomable, pannable view
+    At zoom 1 the image is fitted to the screen (fit_width x fit_height) and centered,
+    which is exactly the layout the viewer always used
+    """
+    def __init__(self, screen_width, screen_height, fit_width, fit_height, max_zoom=64.0):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.fit_width = fit_width
+        self.fit_height = fit_height
+        self.max_zoom = max_zoom
+        self.reset()
+
+    def reset(self):
+        self.zoom = 1.0
+        self.origin_x = (self.screen_width - self.fit_width) // 2
+        self.origin_y = (self.screen_height - self.fit_height) // 2
+
+    @property
+    def width(self):
+        return self.fit_width * self.zoom
+
+    @property
+    def height(self):
+        return self.fit_height * self.zoom
+
+    @property
+    def is_fitted(self):
+        return self.zoom == 1.0
+
+    def params(self):
+        """(x_offset, y_offset, width, height) of the whole image on screen"""
+        return self.origin_x, self.origin_y, self.width, self.height
+
+    def to_screen(self, norm_x, norm_y):
+        return self.origin_x + norm_x * self.width, self.origin_y + norm_y * self.height
+
+    def to_normalized(self, screen_x, screen_y):
+        return (screen_x - self.origin_x) / self.width, (screen_y - self.origin_y) / self.height
+
+    def visible_rect(self):
+        """Normalized (x0, y0, x1, y1) of the part of the image that is on screen"""
+        x0, y0 = self.to_normalized(0, 0)
+        x1, y1 = self.to_normalized(self.screen_width, self.screen_height)
+        return max(x0, 0.0), max(y0, 0.0), min(x1, 1.0), min(y1, 1.0)
+
+    def zoom_at(self, screen_x, screen_y, factor):
+        """Zoom by factor keeping the image point under (screen_x, screen_y) in place"""
+        zoom = min(max(self.zoom * factor, 1.0), self.max_zoom)
+        if zoom == 1.0:
+            self.reset()
+            return
+        norm_x, norm_y = self.to_normalized(screen_x, screen_y)
+        self.zoom = zoom
+        self.origin_x = screen_x - norm_x * self.width
+        self.origin_y = screen_y - norm_y * self.height
+        self._clamp()
+
+    def pan(self, dx, dy):
+        self.origin_x += dx
+        self.origin_y += dy
+        self._clamp()
+
+    def _clamp(self):
+        """Keep the image covering the screen, or centered along an axis where it is smaller"""
+        if self.width <= self.screen_width:
+            self.origin_x = (self.screen_width - self.width) / 2
+        else:
+            self.origin_x = min(max(self.origin_x, self.screen_width - self.width), 0)
+        if self.height <= self.screen_height:
+            self.origin_y = (self.screen_height - self.height) / 2
+        else:
+            self.origin_y = min(max(self.origin_y, self.screen_height - self.height), 0)
@@ -0,0 +1,28 @@
+import numpy as np
+
+
+YOLO_OBB_LINE_FORMAT = "%d" + " %.6f" * 8
+
+
+def read_yolo_obb_labels(label_path):
+    """
+    Read a YOLO OBB label file in one pass
+    Returns an (N,) int class array and an (N, 8) float array of normalized coordinates
+    Lines that do not have exactly 9 values are skipped, like the viewer does
+    """
+    with open(label_path, 'r') as f:
+        rows = [values for values in (line.split() for line in f) if len(values) == 9]
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 8), dtype=np.float64)
+
+    table = np.array(rows, dtype=np.float64)
+    return table[:, 0].astype(np.int64), table[:, 1:]
+
+
+def format_yolo_obb_lines(class_ids, coords):
+    """Format class indices and normalized coordinates as YOLO OBB lines in bulk"""
+    if len(class_ids) == 0:
+        return []
+    values = np.column_stack([class_ids, coords]).ravel().tolist()
+    return ((YOLO_OBB_LINE_FORMAT + "\n") * len(class_ids) % tuple(values)).splitlines()